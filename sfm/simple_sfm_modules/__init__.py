@@ -9,7 +9,7 @@ from .image_loader import ImageLoader
 from .metadata_extractor import MetadataExtractor
 from .feature_extractor import FeatureExtractor
 from .feature_matcher import FeatureMatcher
-from .pose_estimator import PoseEstimator
+from .pose_estimator import PoseEstimator, PoseTable
 from .bundle_adjuster import BundleAdjuster
 from .sfm_pipeline import SFMPipeline
 
@@ -22,6 +22,7 @@ __all__ = [
     'FeatureExtractor',
     'FeatureMatcher',
     'PoseEstimator',
+    'PoseTable',
     'BundleAdjuster',
     'SFMPipeline'
 ] 
\ No newline at end of file
@@ -8,9 +8,38 @@ from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 import os
 from scipy.optimize import least_squares
+from scipy.sparse import coo_matrix
 import cv2
 import random
 
+from .feature_extractor import keypoints_to_xy
+
+# パラメータ数（3D点×3 + カメラ×6）がこれ未満なら密なLM法、以上ならヤコビアンの疎構造を使うTRF法
+DENSE_SOLVER_MAX_PARAMS = 5000
+
+# SoA形式の観測データ (カメラID[K], 3D点ID[K], 画像座標[K, 2])
+ObservationsSoA = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _resolve_keypoints_xy(keypoints_dict: Dict[int, List[cv2.KeyPoint]],
+                          keypoints_xy_dict: Optional[Dict[int, np.ndarray]]) -> Dict[int, np.ndarray]:
+    """特徴点座標配列 (N, 2) の辞書を返す（渡されていないカメラ分だけKeyPointから変換）"""
+    resolved = dict(keypoints_xy_dict) if keypoints_xy_dict is not None else {}
+    for camera_idx, keypoints in keypoints_dict.items():
+        if camera_idx not in resolved:
+            resolved[camera_idx] = keypoints_to_xy(keypoints)
+    return resolved
+
+
+def _observations_to_soa(observations: List[Tuple[int, int, np.ndarray]]) -> ObservationsSoA:
+    """観測データのリスト [(camera_idx, point_idx, observed_2d), ...] をSoA形式に変換"""
+    if len(observations) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, 2), dtype=np.float64)
+    cam_ids = np.fromiter((obs[0] for obs in observations), dtype=np.int64, count=len(observations))
+    point_ids = np.fromiter((obs[1] for obs in observations), dtype=np.int64, count=len(observations))
+    xy = np.array([np.ravel(obs[2])[:2] for obs in observations], dtype=np.float64)
+    return cam_ids, point_ids, xy
+
 
 class BundleAdjuster:
     """バンドル調整クラス"""
@@ -89,15 +118,45 @@ class BundleAdjuster:
         errors = np.linalg.norm(points_2d_observed - points_2d_projected, axis=1)
         return np.mean(errors)
     
+    @staticmethod
+    def select_linear_solver(n_points: int, n_cameras: int) -> str:
+        """問題サイズから線形ソルバーを選択
+        
+        Returns:
+            'dense'（小規模、密なLM法）または 'sparse'（大規模、疎ヤコビアン + LSMR）
+        """
+        if n_points * 3 + n_cameras * 6 < DENSE_SOLVER_MAX_PARAMS:
+            return 'dense'
+        return 'sparse'
+    
+    def _build_jacobian_sparsity(self, cam_ids: np.ndarray, point_ids: np.ndarray,
+                                 n_points: int, n_cameras: int) -> coo_matrix:
+        """残差とパラメータの依存関係（観測ごとに3D点3個 + カメラ6個）の疎行列を作成
+        
+        bundle_adjustment_residuals と同じ条件で観測を除外し、残差の並びを一致させる。
+        """
+        valid = (cam_ids < n_cameras) & (point_ids < n_points)
+        cam_ids = cam_ids[valid]
+        point_ids = point_ids[valid]
+        num_obs = len(cam_ids)
+        
+        # 各観測の2行（x, y）× 9列（点3 + カメラ6）
+        rows = np.repeat(np.arange(2 * num_obs), 9)
+        point_cols = point_ids[:, None] * 3 + np.arange(3)
+        camera_cols = n_points * 3 + cam_ids[:, None] * 6 + np.arange(6)
+        cols = np.repeat(np.hstack([point_cols, camera_cols]), 2, axis=0).reshape(-1)
+        data = np.ones(len(rows), dtype=np.int8)
+        return coo_matrix((data, (rows, cols)), shape=(2 * num_obs, n_points * 3 + n_cameras * 6))
+    
     def bundle_adjustment_residuals(self, params: np.ndarray, 
-                                  observations: List[Tuple[int, int, np.ndarray]],
+                                  observations: ObservationsSoA,
                                   camera_matrix: np.ndarray,
                                   n_points: int, n_cameras: int) -> np.ndarray:
         """バンドル調整の残差を計算
         
         Args:
             params: 最適化パラメータ（3D点 + カメラ姿勢）
-            observations: 観測データ [(camera_idx, point_idx, observed_2d), ...]
+            observations: SoA形式の観測データ (カメラID[K], 3D点ID[K], 画像座標[K, 2])
             camera_matrix: カメラ行列
             n_points: 3D点の数
             n_cameras: カメラの数
@@ -105,11 +164,13 @@ class BundleAdjuster:
         Returns:
             残差ベクトル
         """
+        cam_ids, point_ids, observed_xy = observations
+        
         # 引数の詳細をチェック（最初の呼び出し時のみ）
-        if len(observations) > 0 and len(observations) < 100:
+        if len(cam_ids) > 0 and len(cam_ids) < 100:
             print(f"bundle_adjustment_residuals 引数チェック:")
             print(f"  params shape: {params.shape}, dtype: {params.dtype}")
-            print(f"  observations length: {len(observations)}")
+            print(f"  observations length: {len(cam_ids)}")
             print(f"  camera_matrix shape: {camera_matrix.shape}, dtype: {camera_matrix.dtype}")
             print(f"  n_points: {n_points}, n_cameras: {n_cameras}")
         
@@ -117,78 +178,66 @@ class BundleAdjuster:
         points_3d = params[:n_points * 3].reshape(n_points, 3)
         camera_params = params[n_points * 3:].reshape(n_cameras, 6)  # 回転(3) + 並進(3)
         
-        residuals = []
+        # 範囲外の観測は除外（_build_jacobian_sparsity と同じ条件）
+        valid = (cam_ids < n_cameras) & (point_ids < n_points)
+        cam_ids = cam_ids[valid]
+        point_ids = point_ids[valid]
+        observed_xy = observed_xy[valid]
         
-        for camera_idx, point_idx, observed_2d in observations:
-            if camera_idx >= n_cameras or point_idx >= n_points:
-                continue
-            
-            # カメラパラメータを取得
-            camera_param = camera_params[camera_idx]
-            
-            # 回転ベクトルを回転行列に変換
-            rvec = camera_param[:3]
-            R, _ = cv2.Rodrigues(rvec)
-            t = camera_param[3:]
-            
-            # 3D点を投影（単一の点として処理）
-            point_3d = points_3d[point_idx]
-            
-            # カメラ座標系に変換
-            point_cam = R @ point_3d + t
-            
-            # 正規化座標に変換
-            if point_cam[2] > 0:  # Z座標が正の場合のみ
-                point_norm = point_cam[:2] / point_cam[2]
-                
-                # ピクセル座標に変換
-                projected_2d = camera_matrix[:2, :2] @ point_norm + camera_matrix[:2, 2]
-                
-                # 残差を計算
-                # observed_2dの次元を確認して修正
-                if observed_2d.ndim > 1:
-                    observed_2d = observed_2d.flatten()
-                
-                residual_x = float(observed_2d[0] - projected_2d[0])
-                residual_y = float(observed_2d[1] - projected_2d[1])
-                residuals.append(residual_x)
-                residuals.append(residual_y)
-            else:
-                # 投影に失敗した場合
-                residuals.append(0.0)
-                residuals.append(0.0)
+        # 回転ベクトルを回転行列に変換（カメラごとに1回）
+        rotations = np.array([cv2.Rodrigues(camera_param[:3])[0] for camera_param in camera_params]).reshape(n_cameras, 3, 3)
+        translations = camera_params[:, 3:]
         
-        result = np.array(residuals, dtype=np.float64)
+        # カメラ座標系に変換
+        points_cam = np.einsum('kij,kj->ki', rotations[cam_ids], points_3d[point_ids]) + translations[cam_ids]
+        
+        # 正規化座標に変換（Z座標が正の場合のみ、それ以外は残差0）
+        in_front = points_cam[:, 2] > 0
+        points_norm = np.divide(points_cam[:, :2], points_cam[:, 2:3],
+                                out=np.zeros_like(points_cam[:, :2]), where=in_front[:, None])
+        
+        # ピクセル座標に変換して残差を計算
+        projected_2d = points_norm @ camera_matrix[:2, :2].T + camera_matrix[:2, 2]
+        residuals = observed_xy - projected_2d
+        residuals[~in_front] = 0.0
+        
+        result = residuals.astype(np.float64, copy=False).reshape(-1)
         
         # デバッグ情報（最初の数回のみ）
-        if len(residuals) > 0 and len(residuals) < 100:
-            print(f"残差計算デバッグ: 残差数={len(residuals)}, 結果形状={result.shape}")
+        if len(result) > 0 and len(result) < 100:
+            print(f"残差計算デバッグ: 残差数={len(result)}, 結果形状={result.shape}")
         
         return result
     
     def optimize_bundle_adjustment(self, points_3d: np.ndarray,
                                  poses_dict: Dict[int, Tuple[np.ndarray, np.ndarray]],
-                                 observations: List[Tuple[int, int, np.ndarray]],
+                                 observations: ObservationsSoA,
                                  camera_matrix: np.ndarray,
                                  image_points: Optional[Dict[int, np.ndarray]] = None,
-                                 keypoints_dict: Optional[Dict[int, List[cv2.KeyPoint]]] = None) -> Tuple[np.ndarray, Dict[int, Tuple[np.ndarray, np.ndarray]]]:
+                                 keypoints_dict: Optional[Dict[int, List[cv2.KeyPoint]]] = None,
+                                 keypoints_xy_dict: Optional[Dict[int, np.ndarray]] = None,
+                                 linear_solver: Optional[str] = None) -> Tuple[np.ndarray, Dict[int, Tuple[np.ndarray, np.ndarray]]]:
         """バンドル調整を実行
         
         Args:
             points_3d: 3D点の座標
             poses_dict: カメラ姿勢辞書
-            observations: 観測データ
+            observations: SoA形式の観測データ (カメラID[K], 3D点ID[K], 画像座標[K, 2])
             camera_matrix: カメラ行列
             image_points: 3D点と画像点の対応関係（オプション）
             keypoints_dict: 特徴点辞書（オプション）
+            keypoints_xy_dict: 特徴点座標配列 (N, 2) の辞書（オプション）
+            linear_solver: 'dense' または 'sparse'（未指定なら問題サイズから選択）
             
         Returns:
             (最適化された3D点, 最適化された姿勢辞書)
         """
         print("optimize_bundle_adjustment開始")
+        cam_ids, point_ids, observed_xy = observations
+        num_observations = len(cam_ids)
         print(f"points_3d shape: {points_3d.shape}")
         print(f"poses_dict keys: {list(poses_dict.keys())}")
-        print(f"observations length: {len(observations)}")
+        print(f"observations length: {num_observations}")
         print(f"camera_matrix shape: {camera_matrix.shape}")
         
         if len(points_3d) == 0 or len(poses_dict) == 0:
@@ -198,7 +247,7 @@ class BundleAdjuster:
         n_points = len(points_3d)
         n_cameras = len(poses_dict)
         
-        print(f"バンドル調整を開始: {n_points} 点, {n_cameras} カメラ, {len(observations)} 観測")
+        print(f"バンドル調整を開始: {n_points} 点, {n_cameras} カメラ, {num_observations} 観測")
         
         # 初期パラメータを構築
         print("初期パラメータを構築中...")
@@ -223,7 +272,8 @@ class BundleAdjuster:
             
             initial_params.extend(np.concatenate([rvec, t]))
         
-        initial_params = np.array(initial_params)
+        # 最適化はfloat64で行う（float32の3D点もここで昇格させる）
+        initial_params = np.array(initial_params, dtype=np.float64)
         
         print(f"初期パラメータの形状: {initial_params.shape}")
         print(f"期待される形状: {n_points * 3 + n_cameras * 6}")
@@ -241,25 +291,19 @@ class BundleAdjuster:
                 return points_3d, poses_dict
             
             # 観測データの妥当性をチェック
-            if len(observations) == 0:
+            if num_observations == 0:
                 print("観測データがありません")
                 return points_3d, poses_dict
             
             # 観測データの形式をチェック
-            print(f"観測データ数: {len(observations)}")
-            for i in range(min(5, len(observations))):
-                camera_idx, point_idx, observed_2d = observations[i]
-                print(f"観測 {i}: camera={camera_idx}, point={point_idx}, 2d={observed_2d}, shape={observed_2d.shape}, dtype={observed_2d.dtype}")
-            
-            # 観測データの形式を修正（必要に応じて）
-            corrected_observations = []
-            for camera_idx, point_idx, observed_2d in observations:
-                # observed_2dが2次元配列の場合は1次元に変換
-                if observed_2d.ndim > 1:
-                    observed_2d = observed_2d.flatten()
-                corrected_observations.append((camera_idx, point_idx, observed_2d))
+            print(f"観測データ数: {num_observations}")
+            for i in range(min(5, num_observations)):
+                print(f"観測 {i}: camera={cam_ids[i]}, point={point_ids[i]}, 2d={observed_xy[i]}, dtype={observed_xy.dtype}")
             
-            print(f"修正後の観測データ数: {len(corrected_observations)}")
+            # 小規模問題は密なLM法、大規模問題は疎ヤコビアンを使うTRF法（LSMR）で解く
+            if linear_solver is None:
+                linear_solver = self.select_linear_solver(n_points, n_cameras)
+            print(f"線形ソルバー: {linear_solver}")
             
             # 観測データをサンプリングして数を減らす（メモリ不足回避）
             # lm法を使用するために、残差の数が変数の数より多い必要がある
@@ -268,80 +312,88 @@ class BundleAdjuster:
             # 必要な観測数: (n_points * 3 + n_cameras * 6) / 2 + 1
             required_observations = (n_points * 3 + n_cameras * 6) // 2 + 1000  # 余裕を持って1000追加
             
-            if len(corrected_observations) < required_observations:
-                print(f"観測データが不足しています（{len(corrected_observations)}）。{required_observations}に増やします。")
+            # 観測の水増し（重複・仮の観測）はlm法の制約のためだけに行う
+            # TRF法には残差数の制約がないため、実際の観測のみで解く
+            if linear_solver == 'dense' and num_observations < required_observations:
+                print(f"観測データが不足しています（{num_observations}）。{required_observations}に増やします。")
                 
-                # 方法1: 元の観測データから重複を許してサンプリング
-                if len(corrected_observations) > 0:
+                # 方法1: 元の観測データから重複を許してサンプリング（インデックスで選び配列をまとめて引く）
+                if num_observations > 0:
                     random.seed(42)  # 再現性のため
-                    corrected_observations = random.choices(corrected_observations, k=required_observations)
-                    print(f"重複サンプリング後の観測データ数: {len(corrected_observations)}")
+                    selected = np.array(random.choices(range(num_observations), k=required_observations))
+                    cam_ids, point_ids, observed_xy = cam_ids[selected], point_ids[selected], observed_xy[selected]
+                    print(f"重複サンプリング後の観測データ数: {len(cam_ids)}")
                 
                 # 方法2: まだ不足している場合は、元のimage_pointsから追加の観測を生成
-                if len(corrected_observations) < required_observations and 'image_points' in locals():
+                if len(cam_ids) < required_observations and image_points is not None:
                     print("追加の観測データを生成中...")
-                    additional_observations = []
+                    extra_cam_ids, extra_point_ids, extra_xy = [cam_ids], [point_ids], [observed_xy]
                     
                     # 各カメラの有効な点をチェック
                     for camera_idx, points_2d in image_points.items():
                         if points_2d is not None:
-                            valid_indices = np.where(~np.isnan(points_2d[:, 0]))[0]
+                            valid_indices = np.where(~np.isnan(points_2d).any(axis=1))[0]
                             if len(valid_indices) > 0:
                                 # ランダムに点を選択
                                 random.seed(42 + camera_idx)  # カメラごとに異なるシード
-                                selected_indices = random.choices(valid_indices, k=min(1000, len(valid_indices)))
-                                
-                                for point_idx in selected_indices:
-                                    point_2d = points_2d[point_idx]
-                                    if not np.any(np.isnan(point_2d)):
-                                        observed_2d = np.array([float(point_2d[0]), float(point_2d[1])], dtype=np.float64)
-                                        additional_observations.append((camera_idx, point_idx, observed_2d))
+                                selected_indices = np.array(random.choices(valid_indices, k=min(1000, len(valid_indices))))
+                                extra_cam_ids.append(np.full(len(selected_indices), camera_idx, dtype=np.int64))
+                                extra_point_ids.append(selected_indices.astype(np.int64))
+                                extra_xy.append(points_2d[selected_indices].astype(np.float64))
                     
                     # 追加の観測を既存の観測に追加
-                    corrected_observations.extend(additional_observations)
-                    print(f"追加観測後の観測データ数: {len(corrected_observations)}")
+                    cam_ids = np.concatenate(extra_cam_ids)
+                    point_ids = np.concatenate(extra_point_ids)
+                    observed_xy = np.concatenate(extra_xy)
+                    print(f"追加観測後の観測データ数: {len(cam_ids)}")
                 
                 # 方法3: まだ不足している場合は、特徴点から直接観測を生成
-                if len(corrected_observations) < required_observations:
+                if len(cam_ids) < required_observations:
                     print("特徴点から直接観測データを生成中...")
-                    feature_observations = []
+                    extra_cam_ids, extra_point_ids, extra_xy = [cam_ids], [point_ids], [observed_xy]
                     
-                    for camera_idx, keypoints in keypoints_dict.items():
-                        if len(keypoints) > 0:
-                            # ランダムに特徴点を選択
+                    keypoints_xy_dict = _resolve_keypoints_xy(keypoints_dict or {}, keypoints_xy_dict)
+                    for camera_idx, keypoints_xy in keypoints_xy_dict.items():
+                        if len(keypoints_xy) > 0:
+                            # ランダムに特徴点を選択（座標配列の行を直接引く）
                             random.seed(42 + camera_idx + 1000)  # 異なるシード
-                            selected_keypoints = random.choices(keypoints, k=min(500, len(keypoints)))
-                            
-                            for keypoint in selected_keypoints:
-                                observed_2d = np.array([keypoint.pt[0], keypoint.pt[1]], dtype=np.float64)
-                                # 仮の3D点インデックス（実際には使用されない）
-                                feature_observations.append((camera_idx, 0, observed_2d))
+                            selected_indices = random.choices(range(len(keypoints_xy)), k=min(500, len(keypoints_xy)))
+                            extra_cam_ids.append(np.full(len(selected_indices), camera_idx, dtype=np.int64))
+                            # 仮の3D点インデックス（実際には使用されない）
+                            extra_point_ids.append(np.zeros(len(selected_indices), dtype=np.int64))
+                            extra_xy.append(keypoints_xy[selected_indices].astype(np.float64))
                     
-                    corrected_observations.extend(feature_observations)
-                    print(f"特徴点観測追加後の観測データ数: {len(corrected_observations)}")
+                    cam_ids = np.concatenate(extra_cam_ids)
+                    point_ids = np.concatenate(extra_point_ids)
+                    observed_xy = np.concatenate(extra_xy)
+                    print(f"特徴点観測追加後の観測データ数: {len(cam_ids)}")
                 
                 # 最終的に必要な数に調整
-                if len(corrected_observations) > required_observations:
+                if len(cam_ids) > required_observations:
                     random.seed(42)
-                    corrected_observations = random.sample(corrected_observations, required_observations)
-                    print(f"最終調整後の観測データ数: {len(corrected_observations)}")
+                    selected = np.array(random.sample(range(len(cam_ids)), required_observations))
+                    cam_ids, point_ids, observed_xy = cam_ids[selected], point_ids[selected], observed_xy[selected]
+                    print(f"最終調整後の観測データ数: {len(cam_ids)}")
                 
-            elif len(corrected_observations) > required_observations * 2:
+            elif num_observations > required_observations * 2:
                 # 多すぎる場合は削減
                 max_observations = required_observations * 2
-                print(f"観測データが多すぎます（{len(corrected_observations)}）。サンプリングして{max_observations}に削減します。")
+                print(f"観測データが多すぎます（{num_observations}）。サンプリングして{max_observations}に削減します。")
                 random.seed(42)  # 再現性のため
-                corrected_observations = random.sample(corrected_observations, max_observations)
-                print(f"サンプリング後の観測データ数: {len(corrected_observations)}")
+                selected = np.array(random.sample(range(num_observations), max_observations))
+                cam_ids, point_ids, observed_xy = cam_ids[selected], point_ids[selected], observed_xy[selected]
+                print(f"サンプリング後の観測データ数: {len(cam_ids)}")
+            
+            corrected_observations = (cam_ids, point_ids, observed_xy)
             
             print(f"変数の数: {n_points * 3 + n_cameras * 6}")
-            print(f"残差の数: {len(corrected_observations) * 2}")
-            print(f"残差/変数比: {(len(corrected_observations) * 2) / (n_points * 3 + n_cameras * 6):.2f}")
+            print(f"残差の数: {len(cam_ids) * 2}")
+            print(f"残差/変数比: {(len(cam_ids) * 2) / (n_points * 3 + n_cameras * 6):.2f}")
             
             # 残差関数のテスト実行
             print("残差関数のテスト実行...")
             test_residuals = self.bundle_adjustment_residuals(
-                initial_params, corrected_observations[:10], camera_matrix, n_points, n_cameras
+                initial_params, (cam_ids[:10], point_ids[:10], observed_xy[:10]), camera_matrix, n_points, n_cameras
             )
             print(f"テスト残差の形状: {test_residuals.shape}")
             
@@ -355,42 +407,35 @@ class BundleAdjuster:
             # minimizeの引数を詳細にチェック
             print("minimizeの引数をチェック...")
             print(f"initial_params shape: {initial_params.shape}, dtype: {initial_params.dtype}")
-            print(f"corrected_observations length: {len(corrected_observations)}")
+            print(f"corrected_observations length: {len(cam_ids)}")
             print(f"camera_matrix shape: {camera_matrix.shape}, dtype: {camera_matrix.dtype}")
             print(f"n_points: {n_points}, n_cameras: {n_cameras}")
             
-            # argsの各要素の型と形状をチェック
-            # args = (corrected_observations, camera_matrix, n_points, n_cameras)
-            # print(f"args length: {len(args)}")
-            # for i, arg in enumerate(args):
-            #     if hasattr(arg, 'shape'):
-            #         print(f"args[{i}] shape: {arg.shape}, dtype: {arg.dtype}")
-            #     else:
-            #         print(f"args[{i}] type: {type(arg)}, value: {arg}")
-            
-            # # 最初の数個の観測データの詳細をチェック
-            # print("最初の観測データの詳細:")
-            # for i in range(min(3, len(corrected_observations))):
-            #     camera_idx, point_idx, observed_2d = corrected_observations[i]
-            #     print(f"  観測 {i}: camera={camera_idx}, point={point_idx}")
-            #     print(f"    observed_2d: {observed_2d}, shape={observed_2d.shape}, dtype={observed_2d.dtype}")
-            #     print(f"    observed_2d.ndim: {observed_2d.ndim}")
-            #     print(f"    observed_2d.flatten(): {observed_2d.flatten()}, shape={observed_2d.flatten().shape}")
+            if linear_solver == 'dense':
+                solver_options = {'method': 'lm'}
+            else:
+                solver_options = {
+                    'method': 'trf',
+                    'tr_solver': 'lsmr',
+                    'x_scale': 'jac',
+                    'jac_sparsity': self._build_jacobian_sparsity(cam_ids, point_ids, n_points, n_cameras)
+                }
             
             result = least_squares(
                 self.bundle_adjustment_residuals,
                 initial_params,
                 args=(corrected_observations, camera_matrix, n_points, n_cameras),
-                method='lm',
                 max_nfev=self.max_iterations,
-                ftol=self.tolerance
+                ftol=self.tolerance,
+                **solver_options
             )
             
             if result.success:
                 print(f"バンドル調整成功: 最終コスト = {result.cost:.6f}")
                 
                 # 結果を分解
-                optimized_points_3d = result.x[:n_points * 3].reshape(n_points, 3)
+                # 3D点は入力と同じ精度（パイプラインではfloat32）で返す
+                optimized_points_3d = result.x[:n_points * 3].reshape(n_points, 3).astype(points_3d.dtype, copy=False)
                 
                 optimized_poses_dict = {}
                 param_offset = n_points * 3
@@ -420,7 +465,8 @@ class BundleAdjuster:
     def create_observations(self, keypoints_dict: Dict[int, List[cv2.KeyPoint]],
                           matches_dict: Dict[Tuple[int, int], List[cv2.DMatch]],
                           points_3d: np.ndarray,
-                          point_to_observations: Dict[int, List[Tuple[int, int]]]) -> List[Tuple[int, int, np.ndarray]]:
+                          point_to_observations: Dict[int, List[Tuple[int, int]]],
+                          keypoints_xy_dict: Optional[Dict[int, np.ndarray]] = None) -> List[Tuple[int, int, np.ndarray]]:
         """観測データを作成
         
         Args:
@@ -428,21 +474,22 @@ class BundleAdjuster:
             matches_dict: マッチング結果辞書
             points_3d: 3D点の座標
             point_to_observations: 3D点と観測の対応関係
+            keypoints_xy_dict: 特徴点座標配列 (N, 2) の辞書（オプション）
             
         Returns:
             観測データのリスト
         """
         observations = []
+        keypoints_xy_dict = _resolve_keypoints_xy(keypoints_dict, keypoints_xy_dict)
         
         for point_idx, observations_list in point_to_observations.items():
             if point_idx >= len(points_3d):
                 continue
             
             for camera_idx, keypoint_idx in observations_list:
-                if camera_idx in keypoints_dict and keypoint_idx < len(keypoints_dict[camera_idx]):
-                    # 2D点の座標を正しい形式で取得
-                    keypoint = keypoints_dict[camera_idx][keypoint_idx]
-                    observed_2d = np.array([keypoint.pt[0], keypoint.pt[1]], dtype=np.float64)
+                if camera_idx in keypoints_dict and keypoint_idx < len(keypoints_xy_dict[camera_idx]):
+                    # 2D点の座標を座標配列から取得
+                    observed_2d = keypoints_xy_dict[camera_idx][keypoint_idx].astype(np.float64)
                     
                     # 座標が有効かチェック
                     if not np.any(np.isnan(observed_2d)) and not np.any(np.isinf(observed_2d)):
@@ -504,7 +551,10 @@ class BundleAdjuster:
                             poses_dict: Dict[int, Tuple[np.ndarray, np.ndarray]],
                             points_3d: np.ndarray,
                             metadata_dict: Optional[Dict[int, Dict]] = None,
-                            image_points: Optional[Dict[int, np.ndarray]] = None) -> Tuple[np.ndarray, Dict[int, Tuple[np.ndarray, np.ndarray]]]:
+                            image_points: Optional[Dict[int, np.ndarray]] = None,
+                            observations_soa: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                            keypoints_xy_dict: Optional[Dict[int, np.ndarray]] = None,
+                            linear_solver: Optional[str] = None) -> Tuple[np.ndarray, Dict[int, Tuple[np.ndarray, np.ndarray]]]:
         """バンドル調整を実行
         
         Args:
@@ -514,6 +564,9 @@ class BundleAdjuster:
             points_3d: 3D点の座標
             metadata_dict: メタデータ辞書（オプション）
             image_points: 3D点と画像点の対応関係（オプション）
+            observations_soa: SoA形式の観測データ (カメラID[K], 3D点ID[K], 画像座標[K, 2])（オプション、image_pointsより優先）
+            keypoints_xy_dict: 特徴点座標配列 (N, 2) の辞書（オプション、未指定ならKeyPointから一度だけ作成）
+            linear_solver: 'dense' または 'sparse'（オプション、未指定なら問題サイズから選択）
             
         Returns:
             (最適化された3D点, 最適化された姿勢辞書)
@@ -534,21 +587,27 @@ class BundleAdjuster:
         
         # 観測データを作成
         print("観測データを作成中...")
-        if image_points is not None:
+        if observations_soa is not None:
+            # 詰め込まれたSoA形式の観測データを使用（NaN判定なし）
+            print("SoA形式の観測データを使用して観測データを作成")
+            observations = self._create_observations_from_soa(*observations_soa)
+        elif image_points is not None:
             # SfMパイプラインから取得した対応関係を使用
             print("image_pointsを使用して観測データを作成")
-            observations = self._create_observations_from_image_points(
+            observations = _observations_to_soa(self._create_observations_from_image_points(
                 keypoints_dict, points_3d, image_points
-            )
+            ))
         else:
             # 従来の方法（マッチングベース）
             print("マッチングベースで観測データを作成")
             point_to_observations = self._create_point_observations(matches_dict, poses_dict)
-            observations = self.create_observations(keypoints_dict, matches_dict, points_3d, point_to_observations)
+            observations = _observations_to_soa(self.create_observations(
+                keypoints_dict, matches_dict, points_3d, point_to_observations, keypoints_xy_dict
+            ))
         
-        print(f"観測データ作成完了: {len(observations)} 観測")
+        print(f"観測データ作成完了: {len(observations[0])} 観測")
         
-        if len(observations) == 0:
+        if len(observations[0]) == 0:
             print("バンドル調整: 観測データが不足しています")
             return points_3d, poses_dict
         
@@ -556,7 +615,8 @@ class BundleAdjuster:
         print("optimize_bundle_adjustmentを呼び出し中...")
         try:
             optimized_points_3d, optimized_poses_dict = self.optimize_bundle_adjustment(
-                points_3d, poses_dict, observations, camera_matrix, image_points, keypoints_dict
+                points_3d, poses_dict, observations, camera_matrix, image_points, keypoints_dict,
+                keypoints_xy_dict, linear_solver
             )
             print("optimize_bundle_adjustment完了")
         except Exception as e:
@@ -605,41 +665,44 @@ class BundleAdjuster:
     
     def _compute_total_error(self, points_3d: np.ndarray,
                            poses_dict: Dict[int, Tuple[np.ndarray, np.ndarray]],
-                           observations: List[Tuple[int, int, np.ndarray]],
+                           observations: ObservationsSoA,
                            camera_matrix: np.ndarray) -> float:
         """総再投影誤差を計算
         
         Args:
             points_3d: 3D点の座標
             poses_dict: カメラ姿勢辞書
-            observations: 観測データ
+            observations: SoA形式の観測データ (カメラID[K], 3D点ID[K], 画像座標[K, 2])
             camera_matrix: カメラ行列
             
         Returns:
             総再投影誤差
         """
+        cam_ids, point_ids, observed_xy = observations
         total_error = 0.0
         count = 0
         
-        for camera_idx, point_idx, observed_2d in observations:
-            if camera_idx in poses_dict and point_idx < len(points_3d):
-                R, t = poses_dict[camera_idx]
-                point_3d = points_3d[point_idx]
-                
-                # カメラ座標系に変換
-                point_cam = R @ point_3d + t
-                
-                # 正規化座標に変換
-                if point_cam[2] > 0:  # Z座標が正の場合のみ
-                    point_norm = point_cam[:2] / point_cam[2]
-                    
-                    # ピクセル座標に変換
-                    projected_2d = camera_matrix[:2, :2] @ point_norm + camera_matrix[:2, 2]
-                    
-                    # 誤差を計算
-                    error = np.linalg.norm(observed_2d - projected_2d)
-                    total_error += error
-                    count += 1
+        # カメラごとに該当する観測をまとめて投影
+        in_range = point_ids < len(points_3d)
+        for camera_idx, (R, t) in poses_dict.items():
+            mask = in_range & (cam_ids == camera_idx)
+            if not np.any(mask):
+                continue
+            
+            # カメラ座標系に変換
+            points_cam = points_3d[point_ids[mask]] @ np.asarray(R).T + np.asarray(t).reshape(3)
+            
+            # 正規化座標に変換（Z座標が正の場合のみ）
+            in_front = points_cam[:, 2] > 0
+            if not np.any(in_front):
+                continue
+            points_norm = points_cam[in_front, :2] / points_cam[in_front, 2:3]
+            
+            # ピクセル座標に変換して誤差を計算
+            projected_2d = points_norm @ camera_matrix[:2, :2].T + camera_matrix[:2, 2]
+            errors = np.linalg.norm(observed_xy[mask][in_front] - projected_2d, axis=1)
+            total_error += float(errors.sum())
+            count += len(errors)
         
         return total_error / count if count > 0 else float('inf')
     
@@ -704,6 +767,24 @@ class BundleAdjuster:
         print(f"バンドル調整結果を読み込み: {len(points_3d)} 点, {len(poses_dict)} カメラ")
         return points_3d, poses_dict
     
+    def _create_observations_from_soa(self, cam_ids: np.ndarray, point_ids: np.ndarray,
+                                      uv: np.ndarray) -> ObservationsSoA:
+        """SoA形式の観測データ（カメラID, 3D点ID, 画像座標）を残差計算用の配列に揃える
+        
+        Args:
+            cam_ids: 観測ごとのカメラID (K,)
+            point_ids: 観測ごとの3D点ID (K,)
+            uv: 観測ごとの画像座標 (K, 2)
+            
+        Returns:
+            (カメラID[K] int64, 3D点ID[K] int64, 画像座標[K, 2] float64)
+        """
+        observations = (np.asarray(cam_ids, dtype=np.int64),
+                        np.asarray(point_ids, dtype=np.int64),
+                        np.asarray(uv, dtype=np.float64).reshape(-1, 2))
+        print(f"SoA観測データから観測データを作成: {len(observations[0])} 観測")
+        return observations
+    
     def _create_observations_from_image_points(self, keypoints_dict: Dict[int, List[cv2.KeyPoint]],
                                              points_3d: np.ndarray,
                                              image_points: Dict[int, np.ndarray]) -> List[Tuple[int, int, np.ndarray]]:
@@ -7,6 +7,7 @@ Simple SfM Modules 使用例
 
 import os
 import sys
+import logging
 from pathlib import Path
 
 # モジュールをインポート
@@ -163,6 +164,9 @@ def create_sample_directory():
 
 
 if __name__ == "__main__":
+    # モジュールロガーのINFO以上をコンソールに出力
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
     # コマンドライン引数の処理
     if len(sys.argv) > 1 and sys.argv[1] == "--setup":
         create_sample_directory()
@@ -5,11 +5,27 @@
 
 import cv2
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
 from pathlib import Path
 import os
 
 
+def keypoints_to_xy(keypoints: List[cv2.KeyPoint]) -> np.ndarray:
+    """特徴点リストを (N, 2) float32 の座標配列に変換
+    
+    マッチングごとに ``kp.pt`` を参照せずに済むよう、画像ごとに一度だけ作成する。
+    
+    Args:
+        keypoints: 特徴点リスト
+        
+    Returns:
+        特徴点座標配列 (N, 2)
+    """
+    if len(keypoints) == 0:
+        return np.empty((0, 2), dtype=np.float32)
+    return np.array([kp.pt for kp in keypoints], dtype=np.float32)
+
+
 class FeatureExtractor:
     """特徴点抽出クラス"""
     
@@ -27,6 +43,8 @@ class FeatureExtractor:
         self.sharpen = False
         self.enhance_contrast = False
         self.gray = False
+        # 画像インデックスをキーとした特徴点座標配列 (N, 2) のキャッシュ
+        self.keypoints_xy_dict: Dict[int, np.ndarray] = {}
         print(f"特徴点検出器を初期化: {self.detector_type} (最大{max_features}点)")
     
     def _create_detector(self):
@@ -81,7 +99,7 @@ class FeatureExtractor:
         
         return keypoints, descriptors
     
-    def extract_features_batch(self, images: List[np.ndarray] | Dict[int, np.ndarray], 
+    def extract_features_batch(self, images: Union[List[np.ndarray], Dict[int, np.ndarray]], 
                              output_dir: Optional[str] = None) -> Tuple[Dict[int, List[cv2.KeyPoint]], Dict[int, np.ndarray]]:
         """複数画像から特徴点を一括抽出
         
@@ -115,6 +133,7 @@ class FeatureExtractor:
                 keypoints, descriptors = self.extract_features(image)
                 keypoints_dict[image_idx] = keypoints
                 descriptors_dict[image_idx] = descriptors
+                self.keypoints_xy_dict[image_idx] = keypoints_to_xy(keypoints)
                 print(f"画像 {image_idx}: {len(keypoints)} 特徴点抽出完了")
                 
                 # 特徴点可視化を保存
@@ -127,6 +146,7 @@ class FeatureExtractor:
                 print(f"画像 {image_idx} の特徴点抽出に失敗: {e}")
                 keypoints_dict[image_idx] = []
                 descriptors_dict[image_idx] = np.array([])
+                self.keypoints_xy_dict[image_idx] = keypoints_to_xy([])
         
         print(f"バッチ特徴点抽出完了: {len(keypoints_dict)} 画像")
         return keypoints_dict, descriptors_dict
@@ -162,12 +182,14 @@ class FeatureExtractor:
                     print(f"画像を読み込めません: {image_path}")
                     keypoints_dict[i] = []
                     descriptors_dict[i] = np.array([])
+                    self.keypoints_xy_dict[i] = keypoints_to_xy([])
                     continue
                 
                 # 特徴点を抽出
                 keypoints, descriptors = self.extract_features(image)
                 keypoints_dict[i] = keypoints
                 descriptors_dict[i] = descriptors
+                self.keypoints_xy_dict[i] = keypoints_to_xy(keypoints)
                 print(f"画像 {Path(image_path).name}: {len(keypoints)} 特徴点抽出完了")
                 
                 # 特徴点可視化を保存
@@ -182,6 +204,7 @@ class FeatureExtractor:
                 print(f"画像 {image_path} の特徴点抽出に失敗: {e}")
                 keypoints_dict[i] = []
                 descriptors_dict[i] = np.array([])
+                self.keypoints_xy_dict[i] = keypoints_to_xy([])
         
         print(f"パスからの特徴点抽出完了: {len(keypoints_dict)} 画像")
         return keypoints_dict, descriptors_dict
@@ -337,25 +360,25 @@ class FeatureExtractor:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        # 特徴点を保存
+        # 特徴点を保存（全画像の特徴点を属性ごとに連結したCSR形式、1ファイル）
+        # 画像kの特徴点は xy[offsets[k]:offsets[k + 1]] など
         keypoints_file = output_path / "keypoints.npz"
-        keypoints_data = {}
-        for i, keypoints in keypoints_dict.items():
-            if keypoints:
-                # KeyPointオブジェクトをシリアライズ可能な形式に変換
-                kp_data = []
-                for kp in keypoints:
-                    kp_data.append({
-                        'pt': kp.pt,
-                        'size': kp.size,
-                        'angle': kp.angle,
-                        'response': kp.response,
-                        'octave': kp.octave,
-                        'class_id': kp.class_id
-                    })
-                keypoints_data[f'keypoints_{i}'] = kp_data
-        
-        np.savez_compressed(keypoints_file, **keypoints_data)
+        image_ids = [i for i, keypoints in keypoints_dict.items() if keypoints]
+        all_keypoints = [kp for i in image_ids for kp in keypoints_dict[i]]
+        offsets = np.zeros(len(image_ids) + 1, dtype=np.int64)
+        np.cumsum([len(keypoints_dict[i]) for i in image_ids], out=offsets[1:])
+        
+        np.savez_compressed(
+            keypoints_file,
+            image_ids=np.array(image_ids, dtype=np.int32),
+            offsets=offsets,
+            xy=keypoints_to_xy(all_keypoints),
+            size=np.array([kp.size for kp in all_keypoints], dtype=np.float32),
+            angle=np.array([kp.angle for kp in all_keypoints], dtype=np.float32),
+            response=np.array([kp.response for kp in all_keypoints], dtype=np.float32),
+            octave=np.array([kp.octave for kp in all_keypoints], dtype=np.int32),
+            class_id=np.array([kp.class_id for kp in all_keypoints], dtype=np.int32)
+        )
         
         # ディスクリプタを保存
         descriptors_file = output_path / "descriptors.npz"
@@ -386,23 +409,41 @@ class FeatureExtractor:
         keypoints_file = input_path / "keypoints.npz"
         if keypoints_file.exists():
             keypoints_data = np.load(keypoints_file, allow_pickle=True)
-            for key in keypoints_data.files:
-                if key.startswith('keypoints_'):
-                    i = int(key.split('_')[1])
-                    kp_data = keypoints_data[key]
-                    keypoints = []
-                    for kp_info in kp_data:
-                        kp = cv2.KeyPoint(
-                            x=kp_info['pt'][0],
-                            y=kp_info['pt'][1],
-                            size=kp_info['size'],
-                            angle=kp_info['angle'],
-                            response=kp_info['response'],
-                            octave=kp_info['octave'],
-                            class_id=kp_info['class_id']
-                        )
-                        keypoints.append(kp)
-                    keypoints_dict[i] = keypoints
+            if 'offsets' in keypoints_data.files:
+                offsets = keypoints_data['offsets']
+                xy = keypoints_data['xy']
+                attrs = [keypoints_data[name].tolist()
+                         for name in ('size', 'angle', 'response', 'octave', 'class_id')]
+                xs = xy[:, 0].tolist()
+                ys = xy[:, 1].tolist()
+                for k, i in enumerate(keypoints_data['image_ids'].tolist()):
+                    start, end = int(offsets[k]), int(offsets[k + 1])
+                    keypoints_dict[i] = [
+                        cv2.KeyPoint(x=xs[j], y=ys[j], size=attrs[0][j], angle=attrs[1][j],
+                                     response=attrs[2][j], octave=attrs[3][j], class_id=attrs[4][j])
+                        for j in range(start, end)
+                    ]
+                    self.keypoints_xy_dict[i] = xy[start:end]
+            else:
+                # 旧形式（画像ごとの辞書リスト）
+                for key in keypoints_data.files:
+                    if key.startswith('keypoints_'):
+                        i = int(key.split('_')[1])
+                        kp_data = keypoints_data[key]
+                        keypoints = []
+                        for kp_info in kp_data:
+                            kp = cv2.KeyPoint(
+                                x=kp_info['pt'][0],
+                                y=kp_info['pt'][1],
+                                size=kp_info['size'],
+                                angle=kp_info['angle'],
+                                response=kp_info['response'],
+                                octave=kp_info['octave'],
+                                class_id=kp_info['class_id']
+                            )
+                            keypoints.append(kp)
+                        keypoints_dict[i] = keypoints
+                        self.keypoints_xy_dict[i] = keypoints_to_xy(keypoints)
         
         # ディスクリプタを読み込み
         descriptors_file = input_path / "descriptors.npz"
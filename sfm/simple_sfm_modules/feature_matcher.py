@@ -5,10 +5,32 @@
 
 import cv2
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
 from pathlib import Path
 import os
 
+from .feature_extractor import keypoints_to_xy
+
+# マッチング結果の構造化配列の型（queryIdx, trainIdx, distance）
+MATCH_DTYPE = np.dtype([('q', np.int32), ('t', np.int32), ('d', np.float32)])
+
+
+def matches_to_array(matches: Union[List[cv2.DMatch], np.ndarray]) -> np.ndarray:
+    """DMatchリストを (queryIdx, trainIdx, distance) の構造化配列に変換
+    
+    DMatchの属性参照を1回の走査にまとめ、以降はフィールド ('q', 't', 'd') を
+    インデックス配列としてそのまま使えるようにする。
+    
+    Args:
+        matches: マッチング結果（変換済みの構造化配列ならそのまま返す）
+        
+    Returns:
+        構造化配列 (M,)
+    """
+    if isinstance(matches, np.ndarray):
+        return matches
+    return np.array([(m.queryIdx, m.trainIdx, m.distance) for m in matches], dtype=MATCH_DTYPE)
+
 
 class FeatureMatcher:
     """特徴点マッチングクラス"""
@@ -125,24 +147,37 @@ class FeatureMatcher:
         print(f"距離フィルタリング: {len(matches)} → {len(filtered_matches)} マッチング")
         return filtered_matches
     
-    def get_matched_points(self, keypoints1: List[cv2.KeyPoint], 
-                          keypoints2: List[cv2.KeyPoint], 
-                          matches: List[cv2.DMatch]) -> Tuple[np.ndarray, np.ndarray]:
+    def get_matched_points(self, keypoints1: Union[List[cv2.KeyPoint], np.ndarray], 
+                          keypoints2: Union[List[cv2.KeyPoint], np.ndarray], 
+                          matches: Union[List[cv2.DMatch], np.ndarray],
+                          soa: bool = False) -> Tuple[np.ndarray, np.ndarray]:
         """マッチング結果から対応点の座標を取得
         
         Args:
-            keypoints1: 1つ目の画像の特徴点
-            keypoints2: 2つ目の画像の特徴点
-            matches: マッチング結果
+            keypoints1: 1つ目の画像の特徴点（KeyPointリストまたは (N, 2) の座標配列）
+            keypoints2: 2つ目の画像の特徴点（KeyPointリストまたは (N, 2) の座標配列）
+            matches: マッチング結果（DMatchリストまたは構造化配列）
+            soa: Trueの場合は (2, N) のC連続配列で返す（三角測量にそのまま渡せる形式）
             
         Returns:
             (1つ目の画像の対応点座標, 2つ目の画像の対応点座標)
         """
-        if not matches:
+        if len(matches) == 0:
             return np.array([]), np.array([])
         
-        pts1 = np.float32([keypoints1[m.queryIdx].pt for m in matches])
-        pts2 = np.float32([keypoints2[m.trainIdx].pt for m in matches])
+        # 座標配列が渡された場合は変換せずにそのまま使う
+        xy1 = keypoints1 if isinstance(keypoints1, np.ndarray) else keypoints_to_xy(keypoints1)
+        xy2 = keypoints2 if isinstance(keypoints2, np.ndarray) else keypoints_to_xy(keypoints2)
+        match_arr = matches_to_array(matches)
+        
+        if soa:
+            # (2, N) のビューから列方向に取り出すと結果はC連続の (2, M) になる
+            pts1 = np.take(xy1.T, match_arr['q'], axis=1)
+            pts2 = np.take(xy2.T, match_arr['t'], axis=1)
+            return pts1, pts2
+        
+        pts1 = xy1[match_arr['q']]
+        pts2 = xy2[match_arr['t']]
         
         return pts1, pts2
     
@@ -191,23 +226,33 @@ class FeatureMatcher:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        # マッチング結果を保存
+        # 全ペアのマッチングを連結した配列（CSR形式）で1ファイルに保存
+        # ペアkのマッチングは query_idx[pair_offsets[k]:pair_offsets[k + 1]] など
         matches_file = output_path / "matches.npz"
-        matches_data = {}
-        
+        pair_keys = []
+        match_arrays = []
         for (idx1, idx2), matches in matches_dict.items():
-            if matches:
-                # DMatchオブジェクトをシリアライズ可能な形式に変換
-                match_data = []
-                for match in matches:
-                    match_data.append({
-                        'queryIdx': match.queryIdx,
-                        'trainIdx': match.trainIdx,
-                        'distance': match.distance
-                    })
-                matches_data[f'matches_{idx1}_{idx2}'] = match_data
-        
-        np.savez_compressed(matches_file, **matches_data)
+            if len(matches) > 0:
+                pair_keys.append((idx1, idx2))
+                match_arrays.append(matches_to_array(matches))
+        
+        if match_arrays:
+            all_matches = np.concatenate(match_arrays)
+            counts = [len(arr) for arr in match_arrays]
+        else:
+            all_matches = np.empty(0, dtype=MATCH_DTYPE)
+            counts = []
+        pair_offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+        np.cumsum(counts, out=pair_offsets[1:])
+        
+        np.savez_compressed(
+            matches_file,
+            pair_keys=np.array(pair_keys, dtype=np.int32).reshape(-1, 2),
+            pair_offsets=pair_offsets,
+            query_idx=all_matches['q'],
+            train_idx=all_matches['t'],
+            distance=all_matches['d']
+        )
         print(f"マッチング結果を保存: {output_dir}")
     
     def load_matches(self, input_dir: str) -> Dict[Tuple[int, int], List[cv2.DMatch]]:
@@ -226,24 +271,39 @@ class FeatureMatcher:
         if matches_file.exists():
             matches_data = np.load(matches_file, allow_pickle=True)
             
-            for key in matches_data.files:
-                if key.startswith('matches_'):
-                    parts = key.split('_')
-                    if len(parts) >= 3:
-                        idx1 = int(parts[1])
-                        idx2 = int(parts[2])
-                        
-                        match_data = matches_data[key]
-                        matches = []
-                        for match_info in match_data:
-                            match = cv2.DMatch(
-                                queryIdx=match_info['queryIdx'],
-                                trainIdx=match_info['trainIdx'],
-                                distance=match_info['distance']
-                            )
-                            matches.append(match)
-                        
-                        matches_dict[(idx1, idx2)] = matches
+            if 'pair_offsets' in matches_data.files:
+                pair_keys = matches_data['pair_keys']
+                pair_offsets = matches_data['pair_offsets']
+                query_idx = matches_data['query_idx'].tolist()
+                train_idx = matches_data['train_idx'].tolist()
+                distance = matches_data['distance'].tolist()
+                
+                for k, (idx1, idx2) in enumerate(pair_keys.tolist()):
+                    start, end = int(pair_offsets[k]), int(pair_offsets[k + 1])
+                    matches_dict[(idx1, idx2)] = [
+                        cv2.DMatch(q, t, d)
+                        for q, t, d in zip(query_idx[start:end], train_idx[start:end], distance[start:end])
+                    ]
+            else:
+                # 旧形式（ペアごとの辞書リスト）
+                for key in matches_data.files:
+                    if key.startswith('matches_'):
+                        parts = key.split('_')
+                        if len(parts) >= 3:
+                            idx1 = int(parts[1])
+                            idx2 = int(parts[2])
+                            
+                            match_data = matches_data[key]
+                            matches = []
+                            for match_info in match_data:
+                                match = cv2.DMatch(
+                                    queryIdx=match_info['queryIdx'],
+                                    trainIdx=match_info['trainIdx'],
+                                    distance=match_info['distance']
+                                )
+                                matches.append(match)
+                            
+                            matches_dict[(idx1, idx2)] = matches
         
         print(f"マッチング結果を読み込み: {len(matches_dict)} ペア")
         return matches_dict 
\ No newline at end of file
@@ -8,6 +8,7 @@ import numpy as np
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 
 class ImageLoader:
@@ -111,11 +112,14 @@ class ImageLoader:
         
         return images
     
-    def load_images_from_directory(self, directory: str) -> Tuple[Dict[int, np.ndarray], Dict[int, str]]:
+    def load_images_from_directory(self, directory: str, max_images: Optional[int] = None,
+                                   workers: Optional[int] = None) -> Tuple[Dict[int, np.ndarray], Dict[int, str]]:
         """ディレクトリから画像を読み込み
         
         Args:
             directory: 画像が格納されているディレクトリのパス
+            max_images: 最大画像数（デコード前にパスリストを制限）
+            workers: 読み込みスレッド数（Noneの場合はThreadPoolExecutorの既定値）
             
         Returns:
             (画像辞書, 画像パス辞書)
@@ -127,12 +131,18 @@ class ImageLoader:
             print("画像ファイルが見つかりません")
             return {}, {}
         
-        # 画像を読み込み
+        # 不要なデコードを避けるため、読み込み前に制限
+        if max_images is not None:
+            image_paths = image_paths[:max_images]
+        
+        # 画像を並列に読み込み（JPEGデコード中はGILが解放される）
         images_dict = {}
         paths_dict = {}
         
-        for i, image_path in enumerate(image_paths):
-            image = self.load_image(image_path)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            images = list(executor.map(self.load_image, image_paths))
+        
+        for i, (image_path, image) in enumerate(zip(image_paths, images)):
             if image is not None:
                 images_dict[i] = image
                 paths_dict[i] = image_path
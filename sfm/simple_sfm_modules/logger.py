@@ -109,6 +109,28 @@ class SfMLogger:
         else:
             self.logger.info(message)
     
+    def log_paths_manifest(self, paths: Dict[int, str], filename: str = "image_paths.json") -> str:
+        """画像パスの一覧をセッションディレクトリに一度だけ書き出す
+        
+        各ステップのログには件数と先頭数件のみを記録し、全パスはこのファイルを参照する。
+        
+        Args:
+            paths: 画像インデックス → 画像パスの辞書
+            filename: 出力ファイル名
+            
+        Returns:
+            出力ファイルのパス
+        """
+        manifest_file = self.session_log_dir / filename
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump({str(idx): str(path) for idx, path in paths.items()}, f, ensure_ascii=False, indent=2)
+        
+        self.log_step("paths_manifest", {
+            "num_paths": len(paths),
+            "manifest_file": str(manifest_file)
+        })
+        return str(manifest_file)
+    
     def log_feature_extraction(self, image_id: int, keypoints_count: int, 
                               descriptors_shape: tuple, processing_time: float):
         """特徴点抽出の統計を記録
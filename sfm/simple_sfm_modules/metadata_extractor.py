@@ -7,24 +7,99 @@ Metadata extraction module for SfM pipeline
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterable, Tuple
 import json
 from datetime import datetime
 import os
+import io
+import mmap
+import logging
+from numbers import Rational
+from multiprocessing import Pool
+
+logger = logging.getLogger(__name__)
+
+# JPEGのEXIF(APP1セグメント)は最大64KBで先頭付近に置かれる
+_EXIF_HEADER_BYTES = 64 * 1024
 
 try:
     from PIL import Image, ExifTags
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
-    print("警告: PIL/Pillowが利用できません。EXIFデータの取得が制限されます。")
+    logger.warning("PIL/Pillowが利用できません。EXIFデータの取得が制限されます。")
 
 try:
     import exifread
     EXIFREAD_AVAILABLE = True
 except ImportError:
     EXIFREAD_AVAILABLE = False
-    print("警告: exifreadが利用できません。EXIFデータの取得が制限されます。")
+    logger.warning("exifreadが利用できません。EXIFデータの取得が制限されます。")
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _rational_to_float(value: Rational) -> float:
+    """有理数（Fraction, IFDRational, exifreadのRatio等）をfloatに変換（分母0は0.0）"""
+    denominator = value.denominator
+    return value.numerator / denominator if denominator else 0.0
+
+
+# PILのEXIFタグ名とメタデータのフィールド名の対応
+_PIL_TAG_MAPPINGS = {
+    'Make': 'camera_make',
+    'Model': 'camera_model',
+    'FocalLength': 'focal_length',
+    'FocalLengthIn35mmFilm': 'focal_length_35mm',
+    'FNumber': 'aperture',
+    'MaxApertureValue': 'max_aperture',
+    'ExposureTime': 'exposure_time',
+    'ISOSpeedRatings': 'iso',
+    'DateTime': 'datetime',
+    'Software': 'software',
+    'Artist': 'artist',
+    'Copyright': 'copyright',
+    'Orientation': 'orientation',
+    'ColorSpace': 'color_space'
+}
+
+# EXIFタグID -> フィールド名（タグ名を経由せず1回の参照で引けるようにする）
+_TAG_ID_TO_FIELD = {
+    tag_id: _PIL_TAG_MAPPINGS[tag_name]
+    for tag_id, tag_name in ExifTags.TAGS.items()
+    if tag_name in _PIL_TAG_MAPPINGS
+} if PIL_AVAILABLE else {}
+
+# ワーカープロセスごとに保持するメタデータ抽出器
+_worker_extractor = None
+
+
+def _init_metadata_worker():
+    """ワーカープロセスの初期化"""
+    global _worker_extractor
+    _worker_extractor = MetadataExtractor()
+
+
+def _extract_metadata_worker(task: tuple) -> tuple:
+    """ワーカープロセスで1画像のメタデータを抽出
+
+    Args:
+        task: (画像インデックス, 画像パス)
+
+    Returns:
+        (画像インデックス, シリアライズ可能なメタデータ)
+    """
+    idx, image_path = task
+    try:
+        metadata = _worker_extractor.extract_metadata_from_image(image_path)
+    except Exception as e:
+        logger.debug("メタデータ抽出失敗 %s: %s", Path(image_path).name, e)
+        metadata = _worker_extractor._create_default_metadata(image_path)
+    return idx, _worker_extractor._make_record_serializable(metadata)
 
 
 class MetadataExtractor:
@@ -64,25 +139,32 @@ class MetadataExtractor:
             'default': {'width': 23.5, 'height': 15.6}    # APS-C
         }
     
-    def extract_metadata_from_image(self, image_path: str) -> Dict[str, Any]:
+    def extract_metadata_from_image(self, image_path: str, convert_gps: bool = True,
+                                    stat_result: Optional[os.stat_result] = None) -> Dict[str, Any]:
         """画像ファイルからメタデータを抽出
         
         Args:
             image_path: 画像ファイルのパス
+            stat_result: 取得済みのstat結果（os.scandir等で得たものを渡すとstat呼び出しを省略）
+            convert_gps: GPS座標を10進数に変換するか（Falseの場合は度分秒のまま保持し、
+                後で_convert_gps_fieldsで一括変換する）
             
         Returns:
             メタデータ辞書
         """
         image_path = Path(image_path)
         
-        if not image_path.exists():
-            raise FileNotFoundError(f"画像ファイルが見つかりません: {image_path}")
+        if stat_result is None:
+            try:
+                stat_result = image_path.stat()
+            except FileNotFoundError:
+                raise FileNotFoundError(f"画像ファイルが見つかりません: {image_path}")
         
         if image_path.suffix.lower() not in self.supported_formats:
             raise ValueError(f"サポートされていない画像形式: {image_path.suffix}")
         
         # 基本メタデータを作成
-        metadata = self._create_basic_metadata(image_path)
+        metadata = self._create_basic_metadata(image_path, stat_result)
         
         # 画像サイズを取得
         self._extract_image_size(image_path, metadata)
@@ -92,20 +174,27 @@ class MetadataExtractor:
         if exif_data:
             metadata.update(exif_data)
         
+        if convert_gps:
+            self._convert_gps_fields([metadata])
+        
         # カメラパラメータを推定
         camera_params = self._estimate_camera_parameters(metadata)
         metadata.update(camera_params)
         
         return metadata
     
-    def _create_basic_metadata(self, image_path: Path) -> Dict[str, Any]:
+    def _create_basic_metadata(self, image_path: Path,
+                               stat_result: Optional[os.stat_result] = None) -> Dict[str, Any]:
         """基本メタデータを作成"""
+        if stat_result is None:
+            stat_result = image_path.stat()
+        
         return {
             'file_path': str(image_path),
             'file_name': image_path.name,
-            'file_size': image_path.stat().st_size,
-            'creation_time': datetime.fromtimestamp(image_path.stat().st_ctime).isoformat(),
-            'modification_time': datetime.fromtimestamp(image_path.stat().st_mtime).isoformat(),
+            'file_size': stat_result.st_size,
+            'creation_time': datetime.fromtimestamp(stat_result.st_ctime).isoformat(),
+            'modification_time': datetime.fromtimestamp(stat_result.st_mtime).isoformat(),
             'image_size': None,
             'camera_make': None,
             'camera_model': None,
@@ -141,7 +230,7 @@ class MetadataExtractor:
                 height, width = img.shape[:2]
                 metadata['image_size'] = {'width': width, 'height': height}
         except Exception as e:
-            print(f"画像サイズの取得に失敗: {e}")
+            logger.debug("画像サイズの取得に失敗: %s", e)
     
     def _extract_exif_data(self, image_path: Path) -> Dict[str, Any]:
         """EXIFデータを抽出"""
@@ -155,6 +244,9 @@ class MetadataExtractor:
         if EXIFREAD_AVAILABLE:
             self._extract_exif_with_exifread(image_path, exif_data)
         
+        # 内部用のフラグは呼び出し元に返さない
+        exif_data.pop('_has_gps', None)
+        
         return exif_data
     
     def _extract_exif_with_pil(self, image_path: Path, exif_data: Dict[str, Any]):
@@ -169,42 +261,21 @@ class MetadataExtractor:
                     gps_info = self._extract_gps_info(exif)
                     if gps_info:
                         exif_data.update(gps_info)
+                        exif_data['_has_gps'] = True
         except Exception as e:
-            print(f"PILでのEXIF抽出に失敗: {e}")
+            logger.debug("PILでのEXIF抽出に失敗: %s", e)
     
     def _process_pil_exif_tags(self, exif: Dict, exif_data: Dict[str, Any]):
         """PILのEXIFタグを処理"""
-        tag_mappings = {
-            'Make': 'camera_make',
-            'Model': 'camera_model',
-            'FocalLength': 'focal_length',
-            'FocalLengthIn35mmFilm': 'focal_length_35mm',
-            'FNumber': 'aperture',
-            'MaxApertureValue': 'max_aperture',
-            'ExposureTime': 'exposure_time',
-            'ISOSpeedRatings': 'iso',
-            'DateTime': 'datetime',
-            'Software': 'software',
-            'Artist': 'artist',
-            'Copyright': 'copyright',
-            'Orientation': 'orientation',
-            'ColorSpace': 'color_space'
-        }
-        
         for tag_id, value in exif.items():
-            tag = ExifTags.TAGS.get(tag_id, tag_id)
-            
-            if tag in tag_mappings:
-                field_name = tag_mappings[tag]
+            field_name = _TAG_ID_TO_FIELD.get(tag_id)
+            if field_name:
                 exif_data[field_name] = self._convert_exif_value(value)
     
     def _convert_exif_value(self, value: Any) -> Any:
         """EXIF値を適切な型に変換"""
-        if hasattr(value, 'numerator') and hasattr(value, 'denominator'):
-            try:
-                return float(value.numerator) / float(value.denominator)
-            except (ZeroDivisionError, AttributeError):
-                return str(value)
+        if isinstance(value, Rational):
+            return _rational_to_float(value)
         elif isinstance(value, (int, float)):
             return value
         else:
@@ -213,18 +284,23 @@ class MetadataExtractor:
     def _extract_exif_with_exifread(self, image_path: Path, exif_data: Dict[str, Any]):
         """exifreadを使用してEXIFデータを抽出"""
         try:
-            with open(image_path, 'rb') as f:
-                tags = exifread.process_file(f)
+            # ファイル全体を読み込まず、mmapで必要なページだけを参照する
+            with open(image_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if image_path.suffix.lower() in ('.jpg', '.jpeg'):
+                    tags = exifread.process_file(io.BytesIO(mm[:_EXIF_HEADER_BYTES]), details=False)
+                else:
+                    tags = exifread.process_file(mm, details=False)
             
             self._process_exifread_tags(tags, exif_data)
             
             # GPS情報を取得
-            if not any(key.startswith('gps_') for key in exif_data.keys()):
+            if not exif_data.get('_has_gps'):
                 gps_info = self._extract_gps_info_exifread(tags)
                 if gps_info:
                     exif_data.update(gps_info)
         except Exception as e:
-            print(f"exifreadでのEXIF抽出に失敗: {e}")
+            logger.debug("exifreadでのEXIF抽出に失敗: %s", e)
     
     def _process_exifread_tags(self, tags: Dict, exif_data: Dict[str, Any]):
         """exifreadのタグを処理"""
@@ -299,13 +375,10 @@ class MetadataExtractor:
     def _convert_exifread_rational(self, value: Any) -> Any:
         """exifreadの有理数を変換"""
         if hasattr(value, 'values'):
-            if hasattr(value.values[0], 'numerator') and hasattr(value.values[0], 'denominator'):
-                try:
-                    return float(value.values[0].numerator) / float(value.values[0].denominator)
-                except (ZeroDivisionError, AttributeError):
-                    return str(value.values[0])
-            else:
-                return float(value.values[0])
+            first = value.values[0]
+            if isinstance(first, Rational):
+                return _rational_to_float(first)
+            return float(first)
         return str(value)
     
     def _extract_gps_info(self, exif: Dict) -> Dict[str, Any]:
@@ -326,15 +399,15 @@ class MetadataExtractor:
                 if tag_id in gps_tags:
                     tag_name = gps_tags[tag_id]
                     if tag_name == 'GPSLatitude':
-                        gps_info['gps_latitude'] = self._convert_gps_coordinate(value)
+                        gps_info['gps_latitude'] = self._parse_gps_dms(value)
                     elif tag_name == 'GPSLongitude':
-                        gps_info['gps_longitude'] = self._convert_gps_coordinate(value)
+                        gps_info['gps_longitude'] = self._parse_gps_dms(value)
                     elif tag_name == 'GPSAltitude':
                         gps_info['gps_altitude'] = float(value)
                     elif tag_name == 'GPSTimeStamp':
                         gps_info['gps_timestamp'] = str(value)
         except Exception as e:
-            print(f"GPS情報の抽出に失敗: {e}")
+            logger.debug("GPS情報の抽出に失敗: %s", e)
         
         return gps_info
     
@@ -346,62 +419,70 @@ class MetadataExtractor:
             if 'GPS GPSLatitude' in tags and 'GPS GPSLatitudeRef' in tags:
                 lat = tags['GPS GPSLatitude']
                 lat_ref = tags['GPS GPSLatitudeRef']
-                gps_info['gps_latitude'] = self._convert_gps_coordinate_exifread(lat, lat_ref)
+                gps_info['gps_latitude'] = self._parse_gps_dms_exifread(lat, lat_ref)
             
             if 'GPS GPSLongitude' in tags and 'GPS GPSLongitudeRef' in tags:
                 lon = tags['GPS GPSLongitude']
                 lon_ref = tags['GPS GPSLongitudeRef']
-                gps_info['gps_longitude'] = self._convert_gps_coordinate_exifread(lon, lon_ref)
+                gps_info['gps_longitude'] = self._parse_gps_dms_exifread(lon, lon_ref)
             
             if 'GPS GPSAltitude' in tags:
                 alt = tags['GPS GPSAltitude']
                 gps_info['gps_altitude'] = self._convert_exifread_rational(alt)
         except Exception as e:
-            print(f"exifread GPS情報の抽出に失敗: {e}")
+            logger.debug("exifread GPS情報の抽出に失敗: %s", e)
         
         return gps_info
     
-    def _convert_gps_coordinate(self, coord_tuple: tuple) -> Optional[float]:
-        """GPS座標を10進数に変換（PIL用）"""
+    def _parse_gps_dms(self, coord_tuple: tuple) -> Optional[Tuple[float, float, float, float]]:
+        """GPS座標を(度, 分, 秒, 符号)に分解（PIL用）"""
         try:
-            degrees = float(coord_tuple[0])
-            minutes = float(coord_tuple[1])
-            seconds = float(coord_tuple[2])
-            
-            decimal_degrees = degrees + (minutes / 60.0) + (seconds / 3600.0)
-            return decimal_degrees
+            return (float(coord_tuple[0]), float(coord_tuple[1]), float(coord_tuple[2]), 1.0)
         except Exception:
             return None
     
-    def _convert_gps_coordinate_exifread(self, coord: Any, ref: Any) -> Optional[float]:
-        """GPS座標を10進数に変換（exifread用）"""
+    def _parse_gps_dms_exifread(self, coord: Any, ref: Any) -> Optional[Tuple[float, float, float, float]]:
+        """GPS座標を(度, 分, 秒, 符号)に分解（exifread用）"""
         try:
             if hasattr(coord, 'values'):
-                def convert_rational(value: Any) -> float:
-                    if hasattr(value, 'numerator') and hasattr(value, 'denominator'):
-                        try:
-                            return float(value.numerator) / float(value.denominator)
-                        except (ZeroDivisionError, AttributeError):
-                            return 0.0
-                    else:
-                        return float(value)
-                
-                degrees = convert_rational(coord.values[0])
-                minutes = convert_rational(coord.values[1])
-                seconds = convert_rational(coord.values[2])
-                
-                decimal_degrees = degrees + (minutes / 60.0) + (seconds / 3600.0)
+                degrees, minutes, seconds = (
+                    _rational_to_float(v) if isinstance(v, Rational) else float(v)
+                    for v in coord.values[:3]
+                )
                 
                 # 南緯・西経の場合は負の値にする
-                if str(ref) in ['S', 'W']:
-                    decimal_degrees = -decimal_degrees
+                sign = -1.0 if str(ref) in ['S', 'W'] else 1.0
                 
-                return decimal_degrees
+                return (degrees, minutes, seconds, sign)
         except Exception:
             return None
         
         return None
     
+    def _convert_gps_fields(self, metadata_list: Iterable[Dict[str, Any]]):
+        """度分秒のまま保持しているGPS座標を10進数に一括変換
+        
+        Args:
+            metadata_list: メタデータ辞書の列（その場で書き換える）
+        """
+        targets = []
+        dms_list = []
+        for metadata in metadata_list:
+            for key in ('gps_latitude', 'gps_longitude'):
+                value = metadata.get(key)
+                if isinstance(value, tuple):
+                    targets.append((metadata, key))
+                    dms_list.append(value)
+        
+        if not dms_list:
+            return
+        
+        dms = np.asarray(dms_list, dtype=np.float64)
+        decimal_degrees = (dms[:, 0] + dms[:, 1] / 60.0 + dms[:, 2] / 3600.0) * dms[:, 3]
+        
+        for (metadata, key), value in zip(targets, decimal_degrees.tolist()):
+            metadata[key] = value
+    
     def _estimate_camera_parameters(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """カメラパラメータを推定"""
         camera_params = {
@@ -463,23 +544,106 @@ class MetadataExtractor:
     
     def extract_metadata_batch(self, image_paths: List[str]) -> Dict[int, Dict[str, Any]]:
         """複数画像のメタデータを一括抽出"""
+        return self._extract_metadata_entries([(image_path, None) for image_path in image_paths])
+    
+    def extract_metadata_from_scandir(self, directory: str) -> Dict[int, Dict[str, Any]]:
+        """ディレクトリを走査して全画像のメタデータを抽出
+        
+        os.scandirで得たstat結果を再利用し、画像ごとのstat呼び出しを省略する。
+        
+        Args:
+            directory: 画像ディレクトリのパス
+            
+        Returns:
+            メタデータ辞書（ファイル名順のインデックス）
+        """
+        with os.scandir(directory) as it:
+            entries = sorted(
+                (entry for entry in it
+                 if entry.is_file() and Path(entry.name).suffix.lower() in self.supported_formats),
+                key=lambda entry: entry.name
+            )
+        
+        # キャッシュ済みのlstat結果を使う（シンボリックリンクはリンク先のstatが必要なため抽出時に取得）
+        return self._extract_metadata_entries([
+            (entry.path, None if entry.is_symlink() else entry.stat(follow_symlinks=False))
+            for entry in entries
+        ])
+    
+    def _extract_metadata_entries(self, entries: List[Tuple[str, Optional[os.stat_result]]]) -> Dict[int, Dict[str, Any]]:
+        """(画像パス, stat結果) のリストからメタデータを抽出
+        
+        Args:
+            entries: (画像パス, 取得済みのstat結果またはNone) のリスト
+            
+        Returns:
+            メタデータ辞書（entriesの順のインデックス）
+        """
         metadata_dict = {}
+        failed = []
         
-        print(f"メタデータ抽出を開始: {len(image_paths)} 画像")
+        logger.info("メタデータ抽出を開始: %d 画像", len(entries))
         
-        for i, image_path in enumerate(image_paths):
+        for i, (image_path, stat_result) in enumerate(entries):
             try:
-                metadata = self.extract_metadata_from_image(image_path)
-                metadata_dict[i] = metadata
-                print(f"メタデータ抽出成功: {Path(image_path).name}")
+                metadata_dict[i] = self.extract_metadata_from_image(
+                    image_path, convert_gps=False, stat_result=stat_result
+                )
             except Exception as e:
-                print(f"メタデータ抽出失敗 {Path(image_path).name}: {e}")
+                failed.append((Path(image_path).name, e))
                 # デフォルトメタデータを設定
                 metadata_dict[i] = self._create_default_metadata(image_path)
         
-        print(f"メタデータ抽出完了: {len(metadata_dict)} 画像")
+        # GPS座標は全画像分をまとめて変換
+        self._convert_gps_fields(metadata_dict.values())
+        
+        # 失敗は1件ずつではなく最後にまとめて出力
+        for name, error in failed:
+            logger.debug("メタデータ抽出失敗 %s: %s", name, error)
+        logger.info("メタデータ抽出完了: %d 成功, %d 失敗",
+                    len(metadata_dict) - len(failed), len(failed))
         return metadata_dict
     
+    def extract_metadata_to_jsonl(self, image_paths: List[str], output_path: str,
+                                  num_workers: Optional[int] = None,
+                                  chunksize: int = 32) -> int:
+        """複数画像のメタデータを抽出しながらJSON Lines形式で逐次保存
+        
+        全メタデータをメモリに保持せず、ワーカープロセスから届いた順に1行ずつ書き出す。
+        パイプライン外で大量画像のメタデータを事前抽出する用途向けで、
+        結果は load_metadata_jsonl で読み込める。
+        
+        Args:
+            image_paths: 画像ファイルパスのリスト
+            output_path: 出力先（.jsonl）
+            num_workers: ワーカープロセス数（Noneの場合はCPU数）
+            chunksize: ワーカーへ一度に渡すタスク数
+            
+        Returns:
+            書き出したレコード数
+        """
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        logger.info("メタデータ抽出を開始（JSONL出力）: %d 画像", len(image_paths))
+        
+        count = 0
+        with Pool(processes=num_workers, initializer=_init_metadata_worker) as pool, \
+                open(output_path, 'wb') as f:
+            tasks = enumerate(image_paths)
+            for idx, metadata in pool.imap_unordered(_extract_metadata_worker, tasks, chunksize=chunksize):
+                f.write(self._dumps_jsonl_record({'index': idx, 'metadata': metadata}))
+                count += 1
+        
+        logger.info("メタデータ抽出完了: %d 画像 -> %s", count, output_path)
+        return count
+    
+    def _dumps_jsonl_record(self, record: Dict[str, Any]) -> bytes:
+        """JSON Linesの1行分をバイト列に変換"""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(record, default=str) + b'\n'
+        return (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+    
     def _create_default_metadata(self, image_path: str) -> Dict[str, Any]:
         """デフォルトメタデータを作成"""
         image_path = Path(image_path)
@@ -553,36 +717,42 @@ class MetadataExtractor:
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(serializable_metadata, f, indent=2, ensure_ascii=False)
         
-        print(f"メタデータを保存しました: {output_path}")
+        logger.info("メタデータを保存しました: %s", output_path)
     
     def _make_metadata_serializable(self, metadata_dict: Dict[int, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         """メタデータをシリアライズ可能な形式に変換"""
         serializable_metadata = {}
         for key, metadata in metadata_dict.items():
-            serializable_metadata[str(key)] = {}
-            for k, v in metadata.items():
-                if isinstance(v, np.ndarray):
-                    serializable_metadata[str(key)][k] = v.tolist()
-                elif hasattr(v, 'numerator') and hasattr(v, 'denominator'):
-                    # IFDRationalオブジェクトの場合
-                    try:
-                        serializable_metadata[str(key)][k] = float(v.numerator) / float(v.denominator)
-                    except (ZeroDivisionError, AttributeError):
-                        serializable_metadata[str(key)][k] = str(v)
-                elif hasattr(v, 'values'):
-                    # exifreadの特殊オブジェクトの場合
-                    try:
-                        if hasattr(v, '__iter__'):
-                            serializable_metadata[str(key)][k] = [str(item) for item in v.values]
-                        else:
-                            serializable_metadata[str(key)][k] = str(v)
-                    except:
-                        serializable_metadata[str(key)][k] = str(v)
-                else:
-                    serializable_metadata[str(key)][k] = v
+            serializable_metadata[str(key)] = self._make_record_serializable(metadata)
         
         return serializable_metadata
     
+    def _make_record_serializable(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """1画像分のメタデータをシリアライズ可能な形式に変換"""
+        record = {}
+        for k, v in metadata.items():
+            if isinstance(v, np.ndarray):
+                record[k] = v.tolist()
+            elif isinstance(v, Rational):
+                # IFDRationalオブジェクトの場合
+                record[k] = _rational_to_float(v)
+            elif isinstance(v, dict):
+                # image_size / sensor_size などの入れ子の辞書は値ごとに変換
+                record[k] = self._make_record_serializable(v)
+            elif hasattr(v, 'values') and not callable(v.values):
+                # exifreadの特殊オブジェクトの場合
+                try:
+                    if hasattr(v, '__iter__'):
+                        record[k] = [str(item) for item in v.values]
+                    else:
+                        record[k] = str(v)
+                except:
+                    record[k] = str(v)
+            else:
+                record[k] = v
+        
+        return record
+    
     def load_metadata_json(self, input_path: str) -> Dict[int, Dict[str, Any]]:
         """JSONファイルからメタデータを読み込み"""
         input_path = Path(input_path)
@@ -598,4 +768,22 @@ class MetadataExtractor:
         for key, metadata in data.items():
             metadata_dict[int(key)] = metadata
         
-        return metadata_dict 
\ No newline at end of file
+        return metadata_dict 
+    
+    def load_metadata_jsonl(self, input_path: str) -> Dict[int, Dict[str, Any]]:
+        """JSON Linesファイルからメタデータを読み込み"""
+        input_path = Path(input_path)
+        
+        if not input_path.exists():
+            raise FileNotFoundError(f"メタデータファイルが見つかりません: {input_path}")
+        
+        metadata_dict = {}
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                metadata_dict[int(record['index'])] = record['metadata']
+        
+        # 書き出し順は不定のためインデックス順に並べ替え
+        return dict(sorted(metadata_dict.items()))
@@ -2,6 +2,132 @@ import numpy as np
 import os
 from typing import Dict, List, Tuple, Optional
 import json
+import platform
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    from liburing import (io_uring, io_uring_cqe, io_uring_queue_init, io_uring_queue_exit,
+                          io_uring_get_sqe, io_uring_prep_write, io_uring_submit,
+                          io_uring_wait_cqe, io_uring_cqe_seen,
+                          io_uring_sqe_set_data64, io_uring_cqe_get_data64)
+    LIBURING_AVAILABLE = platform.system() == 'Linux'
+except ImportError:
+    LIBURING_AVAILABLE = False
+
+# ファイル書き込み時のバッファサイズ（4MB単位でまとめて書き込む）
+WRITE_BUFFER_SIZE = 1 << 22
+
+# これを超えるサイズの配列はメモリマップ経由で書き出す
+MEMMAP_THRESHOLD_BYTES = 256 * 1024 * 1024
+
+# ASCII PLYで1回の書き込みにまとめる行数
+ASCII_ROWS_PER_WRITE = 100000
+
+# io_uringで書き込む際のチャンクサイズとキューの深さ
+IO_URING_CHUNK_SIZE = 4 * 1024 * 1024
+IO_URING_QUEUE_DEPTH = 64
+
+# PLYの頂点レコード（リトルエンディアン固定）とASCII出力時の書式
+PLY_XYZ_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4')])
+PLY_XYZRGB_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                             ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+PLY_PROPERTY_TYPES = {
+    np.dtype('<f4'): "float",
+    np.dtype('u1'): "uchar",
+}
+PLY_ASCII_FORMATS = {
+    PLY_XYZ_DTYPE: "%.6f %.6f %.6f",
+    PLY_XYZRGB_DTYPE: "%.6f %.6f %.6f %d %d %d",
+}
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _fill_colors_numba(img_points, img, colors, filled):
+        """未着色の点に画像の色を書き込む（範囲チェック・BGR→RGB変換を1ループで実行）"""
+        height = img.shape[0]
+        width = img.shape[1]
+        for i in prange(img_points.shape[0]):
+            if filled[i]:
+                continue
+            px = img_points[i, 0]
+            py = img_points[i, 1]
+            if not (np.isfinite(px) and np.isfinite(py)):
+                continue
+            x = int(px)
+            y = int(py)
+            if 0 <= x < width and 0 <= y < height:
+                colors[i, 0] = img[y, x, 2]
+                colors[i, 1] = img[y, x, 1]
+                colors[i, 2] = img[y, x, 0]
+                filled[i] = True
+
+
+def _json_default(obj):
+    """JSONで直接扱えない値を変換（NumPy配列は文字列ではなくリストにする）"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    return str(obj)
+
+
+def _write_with_io_uring(fd: int, data: memoryview, offset: int) -> bool:
+    """io_uringでバッファをチャンクに分けてまとめて書き込む
+    
+    Args:
+        fd: ファイルディスクリプタ
+        data: 書き込むバイト列（1次元のmemoryview）
+        offset: 書き込み開始位置
+    
+    Returns:
+        全データを書き込めた場合はTrue
+    """
+    chunks = [(start, data[start:start + IO_URING_CHUNK_SIZE])
+              for start in range(0, len(data), IO_URING_CHUNK_SIZE)]
+    
+    ring = io_uring()
+    cqe = io_uring_cqe()
+    io_uring_queue_init(IO_URING_QUEUE_DEPTH, ring, 0)
+    try:
+        for batch_start in range(0, len(chunks), IO_URING_QUEUE_DEPTH):
+            batch_end = min(batch_start + IO_URING_QUEUE_DEPTH, len(chunks))
+            for chunk_idx in range(batch_start, batch_end):
+                start, chunk = chunks[chunk_idx]
+                sqe = io_uring_get_sqe(ring)
+                io_uring_prep_write(sqe, fd, chunk, len(chunk), offset + start)
+                # 完了は順不同で届くため、チャンク番号をタグとして付けておく
+                io_uring_sqe_set_data64(sqe, chunk_idx)
+            io_uring_submit(ring)
+            
+            # 完了したチャンクの長さと比較し、1チャンクでも書き込みが不完全なら失敗とする
+            ok = True
+            for _ in range(batch_end - batch_start):
+                io_uring_wait_cqe(ring, cqe)
+                chunk_idx = io_uring_cqe_get_data64(cqe)
+                if cqe.res != len(chunks[chunk_idx][1]):
+                    ok = False
+                io_uring_cqe_seen(ring, cqe)
+            if not ok:
+                return False
+    finally:
+        io_uring_queue_exit(ring)
+    
+    return True
 
 
 class PointCloudExporter:
@@ -14,7 +140,8 @@ class PointCloudExporter:
     def export_point_cloud_ply(self, 
                               points_3d: np.ndarray, 
                               colors: Optional[np.ndarray] = None,
-                              filename: str = "point_cloud.ply") -> str:
+                              filename: str = "point_cloud.ply",
+                              verbose: bool = True) -> str:
         """
         3D点群をPLYファイルとして出力
         
@@ -22,6 +149,7 @@ class PointCloudExporter:
             points_3d: 3D点の座標 (N, 3)
             colors: 点の色情報 (N, 3) - RGB値（0-255）
             filename: 出力ファイル名
+            verbose: 保存結果を標準出力に表示するか
         
         Returns:
             出力ファイルのパス
@@ -32,51 +160,41 @@ class PointCloudExporter:
         
         filepath = os.path.join(self.output_dir, filename)
         
-        num_points = len(points_3d)
+        # PLYの型（float / uchar）に合わせて一度だけ連続配列に変換
+        points_3d = np.ascontiguousarray(points_3d, dtype=np.float32)
+        if colors is not None:
+            colors = np.ascontiguousarray(colors, dtype=np.uint8)
         
-        # PLYファイルヘッダーを作成
-        header = [
-            "ply",
-            "format ascii 1.0",
-            f"element vertex {num_points}",
-            "property float x",
-            "property float y", 
-            "property float z"
-        ]
+        num_points = len(points_3d)
         
-        if colors is not None:
-            header.extend([
-                "property uchar red",
-                "property uchar green",
-                "property uchar blue"
-            ])
+        # 点データと書式をまとめて用意（色はuint8のまま保持する）
+        vertices = self._build_vertices(points_3d, colors)
+        fmt = PLY_ASCII_FORMATS[vertices.dtype]
         
-        header.append("end_header")
+        # PLYファイルヘッダーを作成
+        header = self._build_ply_header("ascii 1.0", vertices.dtype, len(vertices))
         
         # ファイルに書き込み
-        with open(filepath, 'w') as f:
+        with open(filepath, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
             # ヘッダーを書き込み
-            for line in header:
-                f.write(line + '\n')
+            f.write(header)
             
-            # 点データを書き込み
-            for i in range(num_points):
-                line = f"{points_3d[i, 0]:.6f} {points_3d[i, 1]:.6f} {points_3d[i, 2]:.6f}"
-                
-                if colors is not None:
-                    line += f" {int(colors[i, 0])} {int(colors[i, 1])} {int(colors[i, 2])}"
-                
-                f.write(line + '\n')
+            # 点データを行単位で整形し、まとめて書き込み
+            for start in range(0, num_points, ASCII_ROWS_PER_WRITE):
+                rows = vertices[start:start + ASCII_ROWS_PER_WRITE].tolist()
+                f.write(('\n'.join([fmt % row for row in rows]) + '\n').encode('ascii'))
         
-        print(f"点群データを保存しました: {filepath}")
-        print(f"点の数: {num_points}")
+        if verbose:
+            print(f"点群データを保存しました: {filepath}")
+            print(f"点の数: {num_points}")
         
         return filepath
     
     def export_point_cloud_binary_ply(self, 
                                      points_3d: np.ndarray, 
                                      colors: Optional[np.ndarray] = None,
-                                     filename: str = "point_cloud_binary.ply") -> str:
+                                     filename: str = "point_cloud_binary.ply",
+                                     verbose: bool = True) -> str:
         """
         3D点群をバイナリPLYファイルとして出力（高速）
         
@@ -84,6 +202,7 @@ class PointCloudExporter:
             points_3d: 3D点の座標 (N, 3)
             colors: 点の色情報 (N, 3) - RGB値（0-255）
             filename: 出力ファイル名
+            verbose: 保存結果を標準出力に表示するか
         
         Returns:
             出力ファイルのパス
@@ -94,56 +213,162 @@ class PointCloudExporter:
         
         filepath = os.path.join(self.output_dir, filename)
         
+        # PLYの型（float / uchar）に合わせて一度だけ連続配列に変換
+        points_3d = np.ascontiguousarray(points_3d, dtype=np.float32)
+        if colors is not None:
+            colors = np.ascontiguousarray(colors, dtype=np.uint8)
+        
         num_points = len(points_3d)
         
-        # PLYファイルヘッダーを作成
-        header = [
-            "ply",
-            "format binary_little_endian 1.0",
-            f"element vertex {num_points}",
-            "property float x",
-            "property float y", 
-            "property float z"
-        ]
+        # 巨大な色付き点群は、中間の構造化配列を作らずにマップしたファイルへ直接書き込む
+        # （io_uringが使える場合は連続した頂点バッファが必要なため、下の共通経路で書き込む）
+        if colors is not None and not LIBURING_AVAILABLE and \
+                num_points * PLY_XYZRGB_DTYPE.itemsize > MEMMAP_THRESHOLD_BYTES:
+            header = self._build_ply_header("binary_little_endian 1.0", PLY_XYZRGB_DTYPE, num_points)
+            with open(filepath, 'wb') as f:
+                f.write(header)
+                self._write_xyzrgb_memmap(f, filepath, points_3d, colors)
+            
+            if verbose:
+                print(f"バイナリ点群データを保存しました: {filepath}")
+                print(f"点の数: {num_points}")
+            return filepath
         
-        if colors is not None:
-            header.extend([
-                "property uchar red",
-                "property uchar green",
-                "property uchar blue"
-            ])
+        # 頂点データを1つの構造化配列にまとめる
+        vertices = self._build_vertices(points_3d, colors)
         
-        header.append("end_header")
+        # PLYファイルヘッダーを作成
+        header = self._build_ply_header("binary_little_endian 1.0", vertices.dtype, len(vertices))
         
         # ファイルに書き込み
-        with open(filepath, 'wb') as f:
+        with open(filepath, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
             # ヘッダーを書き込み
-            for line in header:
-                f.write((line + '\n').encode('ascii'))
+            f.write(header)
             
-            # 点データをバイナリで書き込み
-            for i in range(num_points):
-                # 座標データ
-                f.write(points_3d[i].astype(np.float32).tobytes())
-                
-                # 色データ
-                if colors is not None:
-                    f.write(colors[i].astype(np.uint8).tobytes())
+            # 点データをバイナリで一括書き込み
+            # 巨大な点群はio_uringまたはmmapで書き込み、それ以外はtobytes()による
+            # コピーを作らず配列のバッファを直接書き込む
+            if not self._write_body_io_uring(f, vertices) and \
+                    not self._write_body_memmap(f, filepath, vertices):
+                vertices.tofile(f)
         
-        print(f"バイナリ点群データを保存しました: {filepath}")
-        print(f"点の数: {num_points}")
+        if verbose:
+            print(f"バイナリ点群データを保存しました: {filepath}")
+            print(f"点の数: {num_points}")
         
         return filepath
     
+    def _build_ply_header(self, ply_format: str, vertex_dtype: np.dtype, num_vertices: int) -> bytes:
+        """頂点レコードの型からPLYヘッダーを作成
+        
+        end_headerの直後は改行1つのみとし、空行を挟まずに頂点データを続ける
+        （空行があると読み込めないツールがあるため）。
+        """
+        header = [
+            "ply",
+            f"format {ply_format}",
+            f"element vertex {num_vertices}",
+        ]
+        for name in vertex_dtype.names:
+            header.append(f"property {PLY_PROPERTY_TYPES[vertex_dtype[name]]} {name}")
+        header.append("end_header")
+        
+        return ('\n'.join(header) + '\n').encode('ascii')
+    
+    def _build_vertices(self, points_3d: np.ndarray, colors: Optional[np.ndarray]) -> np.ndarray:
+        """色の有無に応じた頂点レコード配列を作成（分岐はここで1回だけ行う）"""
+        if colors is not None:
+            return self._build_xyzrgb_vertices(points_3d, colors)
+        return self._build_xyz_vertices(points_3d)
+    
+    def _build_xyz_vertices(self, points_3d: np.ndarray) -> np.ndarray:
+        """座標のみの頂点レコード配列を作成（コピーなしのビュー）"""
+        return points_3d.astype('<f4', copy=False).view(PLY_XYZ_DTYPE).reshape(-1)
+    
+    def _build_xyzrgb_vertices(self, points_3d: np.ndarray, colors: np.ndarray) -> np.ndarray:
+        """座標と色の頂点レコード配列を作成"""
+        vertices = np.empty(len(points_3d), dtype=PLY_XYZRGB_DTYPE)
+        vertices['x'] = points_3d[:, 0]
+        vertices['y'] = points_3d[:, 1]
+        vertices['z'] = points_3d[:, 2]
+        vertices['red'] = colors[:, 0]
+        vertices['green'] = colors[:, 1]
+        vertices['blue'] = colors[:, 2]
+        return vertices
+    
+    def _write_body_io_uring(self, f, vertices: np.ndarray) -> bool:
+        """巨大な頂点データをio_uringで書き込む（Linuxかつliburingがある場合のみ）
+        
+        Returns:
+            io_uringで書き込んだ場合はTrue（Falseの場合は呼び出し側で通常の書き込みを行う）
+        """
+        if not LIBURING_AVAILABLE or vertices.nbytes <= MEMMAP_THRESHOLD_BYTES:
+            return False
+        
+        f.flush()
+        offset = f.tell()
+        try:
+            if _write_with_io_uring(f.fileno(), memoryview(vertices.view(np.uint8)), offset):
+                f.seek(offset + vertices.nbytes)
+                return True
+        except Exception as e:
+            print(f"io_uringでの書き込みに失敗しました。通常の書き込みに切り替えます: {e}")
+        
+        f.seek(offset)
+        return False
+    
+    def _write_body_memmap(self, f, filepath: str, vertices: np.ndarray) -> bool:
+        """巨大な頂点データをファイルをマップして直接書き込む
+        
+        Returns:
+            mmapで書き込んだ場合はTrue（Falseの場合は呼び出し側で通常の書き込みを行う）
+        """
+        if vertices.nbytes <= MEMMAP_THRESHOLD_BYTES:
+            return False
+        
+        # ヘッダーを確定させてからボディ分の領域を確保
+        f.flush()
+        body_offset = f.tell()
+        f.truncate(body_offset + vertices.nbytes)
+        
+        mm = np.memmap(filepath, dtype=vertices.dtype, mode='r+',
+                       offset=body_offset, shape=(len(vertices),))
+        mm[:] = vertices
+        mm.flush()
+        del mm
+        
+        f.seek(body_offset + vertices.nbytes)
+        return True
+    
+    def _write_xyzrgb_memmap(self, f, filepath: str, points_3d: np.ndarray, colors: np.ndarray):
+        """座標と色をマップしたファイルの頂点レコードへフィールドごとに直接書き込む"""
+        f.flush()
+        body_offset = f.tell()
+        num_points = len(points_3d)
+        f.truncate(body_offset + num_points * PLY_XYZRGB_DTYPE.itemsize)
+        
+        mm = np.memmap(filepath, dtype=PLY_XYZRGB_DTYPE, mode='r+',
+                       offset=body_offset, shape=(num_points,))
+        mm['x'] = points_3d[:, 0]
+        mm['y'] = points_3d[:, 1]
+        mm['z'] = points_3d[:, 2]
+        mm['red'] = colors[:, 0]
+        mm['green'] = colors[:, 1]
+        mm['blue'] = colors[:, 2]
+        mm.flush()
+        del mm
+    
     def export_point_cloud_numpy(self, 
                                 points_3d: np.ndarray, 
-                                filename: str = "point_cloud.npy") -> str:
+                                filename: str = "point_cloud.npy",
+                                verbose: bool = True) -> str:
         """
         3D点群をNumPy配列として保存
         
         Args:
             points_3d: 3D点の座標 (N, 3)
             filename: 出力ファイル名
+            verbose: 保存結果を標準出力に表示するか
         
         Returns:
             出力ファイルのパス
@@ -153,10 +378,21 @@ class PointCloudExporter:
             return None
         
         filepath = os.path.join(self.output_dir, filename)
-        np.save(filepath, points_3d)
         
-        print(f"NumPy点群データを保存しました: {filepath}")
-        print(f"点の数: {len(points_3d)}")
+        if points_3d.nbytes > MEMMAP_THRESHOLD_BYTES:
+            # 巨大な点群はファイルをマップして直接書き込む
+            mm = np.lib.format.open_memmap(
+                filepath, mode='w+', dtype=points_3d.dtype, shape=points_3d.shape
+            )
+            mm[...] = points_3d
+            mm.flush()
+            del mm
+        else:
+            np.save(filepath, points_3d, allow_pickle=False)
+        
+        if verbose:
+            print(f"NumPy点群データを保存しました: {filepath}")
+            print(f"点の数: {len(points_3d)}")
         
         return filepath
     
@@ -165,7 +401,10 @@ class PointCloudExporter:
                                         colors: Optional[np.ndarray] = None,
                                         camera_poses: Optional[Dict] = None,
                                         metadata: Optional[Dict] = None,
-                                        base_filename: str = "point_cloud") -> Dict[str, str]:
+                                        base_filename: str = "point_cloud",
+                                        write_ascii: bool = False,
+                                        write_binary: bool = True,
+                                        verbose: bool = True) -> Dict[str, str]:
         """
         点群データとメタデータを複数形式で出力
         
@@ -175,53 +414,81 @@ class PointCloudExporter:
             camera_poses: カメラ姿勢情報
             metadata: 追加メタデータ
             base_filename: 基本ファイル名
+            write_ascii: ASCII形式のPLYを出力するか
+            write_binary: バイナリ形式のPLYを出力するか
+            verbose: 保存結果を標準出力に表示するか
         
         Returns:
             出力ファイルパスの辞書
         """
-        output_files = {}
-        
-        # 点群データを出力
-        if points_3d is not None and len(points_3d) > 0:
-            # PLYファイル（ASCII）
-            ply_file = self.export_point_cloud_ply(
-                points_3d, colors, f"{base_filename}.ply"
-            )
-            if ply_file:
-                output_files['ply'] = ply_file
+        # 各形式は別ファイルへの書き込みなので並列に実行する
+        futures = {}
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            # 点群データを出力
+            if points_3d is not None and len(points_3d) > 0:
+                # PLYファイル（ASCII）
+                if write_ascii:
+                    futures['ply'] = executor.submit(
+                        self.export_point_cloud_ply, points_3d, colors, f"{base_filename}.ply", verbose
+                    )
+                
+                # PLYファイル（バイナリ）
+                if write_binary:
+                    futures['binary_ply'] = executor.submit(
+                        self.export_point_cloud_binary_ply, points_3d, colors, f"{base_filename}_binary.ply", verbose
+                    )
+                
+                # NumPy配列
+                futures['numpy'] = executor.submit(
+                    self.export_point_cloud_numpy, points_3d, f"{base_filename}.npy", verbose
+                )
             
-            # PLYファイル（バイナリ）
-            binary_ply_file = self.export_point_cloud_binary_ply(
-                points_3d, colors, f"{base_filename}_binary.ply"
-            )
-            if binary_ply_file:
-                output_files['binary_ply'] = binary_ply_file
+            # カメラ姿勢情報を出力
+            if camera_poses:
+                futures['cameras'] = executor.submit(
+                    self.export_json, camera_poses, f"{base_filename}_cameras.json", "カメラ姿勢情報", verbose
+                )
             
-            # NumPy配列
-            npy_file = self.export_point_cloud_numpy(
-                points_3d, f"{base_filename}.npy"
-            )
-            if npy_file:
-                output_files['numpy'] = npy_file
-        
-        # カメラ姿勢情報を出力
-        if camera_poses:
-            camera_file = os.path.join(self.output_dir, f"{base_filename}_cameras.json")
-            with open(camera_file, 'w') as f:
-                json.dump(camera_poses, f, indent=2, default=str)
-            output_files['cameras'] = camera_file
-            print(f"カメラ姿勢情報を保存しました: {camera_file}")
-        
-        # メタデータを出力
-        if metadata:
-            metadata_file = os.path.join(self.output_dir, f"{base_filename}_metadata.json")
-            with open(metadata_file, 'w') as f:
-                json.dump(metadata, f, indent=2, default=str)
-            output_files['metadata'] = metadata_file
-            print(f"メタデータを保存しました: {metadata_file}")
+            # メタデータを出力
+            if metadata:
+                futures['metadata'] = executor.submit(
+                    self.export_json, metadata, f"{base_filename}_metadata.json", "メタデータ", verbose
+                )
+        
+        output_files = {}
+        for key, future in futures.items():
+            output_file = future.result()
+            if output_file:
+                output_files[key] = output_file
         
         return output_files
     
+    def export_json(self, data: Dict, filename: str, description: str,
+                     verbose: bool = True) -> str:
+        """辞書をJSONファイルとして出力
+        
+        Args:
+            data: 出力する辞書
+            filename: 出力ファイル名
+            description: ログ出力用の説明
+            verbose: 保存結果を標準出力に表示するか
+        
+        Returns:
+            出力ファイルのパス
+        """
+        filepath = os.path.join(self.output_dir, filename)
+        if ORJSON_AVAILABLE:
+            # NumPy配列や整数キーもorjson側で直接シリアライズする
+            option = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(data, option=option, default=_json_default))
+        else:
+            with open(filepath, 'w') as f:
+                json.dump(data, f, indent=2, default=_json_default)
+        if verbose:
+            print(f"{description}を保存しました: {filepath}")
+        return filepath
+    
     def create_colored_point_cloud(self, 
                                   points_3d: np.ndarray, 
                                   images: Dict[str, np.ndarray],
@@ -242,31 +509,62 @@ class PointCloudExporter:
         if points_3d is None or len(points_3d) == 0:
             return None
         
-        colors = np.zeros((len(points_3d), 3), dtype=np.uint8)
-        
-        # 各3D点について、対応する画像から色を取得
-        for i, point_3d in enumerate(points_3d):
-            # この点に対応する画像と座標を探す
-            point_color = [128, 128, 128]  # デフォルトはグレー
+        num_points = len(points_3d)
+        colors = np.full((num_points, 3), 128, dtype=np.uint8)  # デフォルトはグレー
+        filled = np.zeros(num_points, dtype=bool)
+        
+        # 画像ごとに、まだ色が決まっていない点の色をまとめて取得
+        # （image_pointsの走査順で最初に見つかった色を採用する）
+        # 画像は遅延読み込みの場合があるため、対応点のある画像だけを取得する
+        for img_name in image_points:
+            if filled.all():
+                break
+            if img_name not in images:
+                continue
+            img = images[img_name]
+            if img is None:
+                continue
+            
+            img_points = self._to_image_point_array(image_points[img_name])[:num_points]
+            
+            # Numbaが利用可能なカラー画像は並列カーネルで処理
+            if NUMBA_AVAILABLE and len(img.shape) == 3:
+                n = len(img_points)
+                _fill_colors_numba(np.ascontiguousarray(img_points), img, colors[:n], filled[:n])
+                continue
             
-            for img_name, img in images.items():
-                if img_name in image_points and i < len(image_points[img_name]):
-                    img_point = image_points[img_name][i]
-                    if img_point is not None:
-                        x, y = int(img_point[0]), int(img_point[1])
-                        if 0 <= x < img.shape[1] and 0 <= y < img.shape[0]:
-                            if len(img.shape) == 3:  # カラー画像
-                                # OpenCVのBGR順序をRGB順序に変換
-                                bgr_color = img[y, x]
-                                point_color = [bgr_color[2], bgr_color[1], bgr_color[0]]  # BGR → RGB
-                            else:  # グレースケール画像
-                                point_color = [img[y, x]] * 3
-                            break
+            # 未着色かつ座標が有効な点
+            candidates = ~filled[:len(img_points)] & np.isfinite(img_points).all(axis=1)
+            point_indices = np.nonzero(candidates)[0]
+            xs = img_points[point_indices, 0].astype(np.intp)
+            ys = img_points[point_indices, 1].astype(np.intp)
             
-            colors[i] = point_color
+            # 画像範囲内の点のみ
+            in_bounds = (xs >= 0) & (xs < img.shape[1]) & (ys >= 0) & (ys < img.shape[0])
+            point_indices = point_indices[in_bounds]
+            xs = xs[in_bounds]
+            ys = ys[in_bounds]
+            
+            if len(img.shape) == 3:  # カラー画像
+                # OpenCVのBGR順序をRGB順序に変換（コピーを作らないビュー）
+                img_rgb = img[..., 2::-1]
+                colors[point_indices] = img_rgb[ys, xs]
+            else:  # グレースケール画像
+                colors[point_indices] = img[ys, xs][:, None]
+            
+            filled[point_indices] = True
         
         return colors
-
+    
+    def _to_image_point_array(self, points) -> np.ndarray:
+        """画像点（Noneを含むリストまたは配列）を(N, 2)のfloat配列に変換"""
+        points_array = np.asarray(points)
+        if points_array.dtype == object:
+            points_array = np.array(
+                [[np.nan, np.nan] if point is None else point[:2] for point in points],
+                dtype=np.float64
+            )
+        return points_array.reshape(-1, 2).astype(np.float64, copy=False)
 
 if __name__ == "__main__":
     # テスト用コード
@@ -282,7 +580,8 @@ if __name__ == "__main__":
         points_3d=points_3d,
         colors=colors,
         camera_poses={"test": "camera_data"},
-        metadata={"num_points": num_points, "description": "テスト点群"}
+        metadata={"num_points": num_points, "description": "テスト点群"},
+        write_ascii=True
     )
     
     print("出力ファイル:", output_files) 
\ No newline at end of file
@@ -5,25 +5,340 @@
 
 import cv2
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Union
 from pathlib import Path
 import os
+import logging
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+from .feature_extractor import keypoints_to_xy
+from .feature_matcher import matches_to_array
+
+logger = logging.getLogger(__name__)
+
+# 基本行列推定の手法（USAC_MAGSACが無い古いOpenCVではRANSAC）
+USAC_AVAILABLE = hasattr(cv2, 'USAC_MAGSAC')
+ESSENTIAL_MAT_METHOD = cv2.USAC_MAGSAC if USAC_AVAILABLE else cv2.RANSAC
+
+# PnPの解法（SQPnPが無い古いOpenCVでは反復法）
+PNP_METHOD = getattr(cv2, 'SOLVEPNP_SQPNP', cv2.SOLVEPNP_ITERATIVE)
+PNP_ITERATIONS = 100
+PNP_REPROJECTION_ERROR = 2.0
+PNP_CONFIDENCE = 0.999
+
+# 適応閾値（ADAPT方式）のパラメータ（ピクセル）
+ADAPTIVE_INITIAL_THRESHOLD = 3.0   # 1回目の緩い閾値
+ADAPTIVE_MIN_THRESHOLD = 0.5       # 閾値の下限
+ADAPTIVE_QUANTILE = 0.95           # インライア残差の分位点
+ADAPTIVE_DISCOUNT = 0.99           # 分位点に掛ける割引率
+ADAPTIVE_HISTOGRAM_BINS = 256     # 分位点計算用ヒストグラムのビン数
+
+# 正規化座標で基本行列を推定する際のカメラ行列
+_IDENTITY_K = np.eye(3)
+
+
+def _match_index_arrays(matches: Union[List[cv2.DMatch], np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """マッチング結果から queryIdx / trainIdx のインデックス配列を取得"""
+    match_arr = matches_to_array(matches)
+    return match_arr['q'], match_arr['t']
+
+
+def _histogram_quantile(values: np.ndarray, q: float, upper: float,
+                        num_bins: int = ADAPTIVE_HISTOGRAM_BINS) -> float:
+    """[0, upper] の値の分位点をヒストグラムの累積から求める（O(N + B)、ビン上端を返す）"""
+    bins = np.linspace(0.0, upper, num_bins + 1)
+    hist, _ = np.histogram(values, bins)
+    idx = int(np.searchsorted(hist.cumsum(), q * len(values)))
+    return float(bins[min(idx, num_bins - 1) + 1])
+
+
+def sampson_residuals(E: np.ndarray, p1: np.ndarray, p2: np.ndarray) -> np.ndarray:
+    """正規化座標の対応点に対するSampson距離（二乗）を計算
+    
+    行列積の中間配列 (N, 3) を作らないよう、Eの9要素を展開して要素ごとに計算する。
+    
+    Args:
+        E: 基本行列 (3, 3)
+        p1: 1つ目の画像の正規化座標 (N, 2)
+        p2: 2つ目の画像の正規化座標 (N, 2)
+        
+    Returns:
+        Sampson距離の二乗 (N,)
+    """
+    if NUMBA_AVAILABLE:
+        out = np.empty(len(p1), dtype=np.float64)
+        _sampson_kernel(np.ascontiguousarray(E, dtype=np.float64),
+                        np.ascontiguousarray(p1, dtype=np.float64),
+                        np.ascontiguousarray(p2, dtype=np.float64), out)
+        return out
+    
+    e00, e01, e02 = E[0]
+    e10, e11, e12 = E[1]
+    e20, e21, e22 = E[2]
+    x1, y1 = p1[:, 0], p1[:, 1]
+    x2, y2 = p2[:, 0], p2[:, 1]
+    
+    # E·p1 と E^T·p2 の第1・第2成分
+    ex0 = e00 * x1 + e01 * y1 + e02
+    ex1 = e10 * x1 + e11 * y1 + e12
+    ex2 = e20 * x1 + e21 * y1 + e22
+    etx0 = e00 * x2 + e10 * y2 + e20
+    etx1 = e01 * x2 + e11 * y2 + e21
+    
+    num = x2 * ex0 + y2 * ex1 + ex2
+    den = ex0 * ex0 + ex1 * ex1 + etx0 * etx0 + etx1 * etx1
+    return num * num / np.maximum(den, 1e-12)
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _sampson_kernel(E, p1, p2, out):
+        """Eの9要素をスカラーに展開し、点ごとのSampson距離（二乗）をoutに書き込む"""
+        e00 = E[0, 0]
+        e01 = E[0, 1]
+        e02 = E[0, 2]
+        e10 = E[1, 0]
+        e11 = E[1, 1]
+        e12 = E[1, 2]
+        e20 = E[2, 0]
+        e21 = E[2, 1]
+        e22 = E[2, 2]
+        for i in prange(p1.shape[0]):
+            x1 = p1[i, 0]
+            y1 = p1[i, 1]
+            x2 = p2[i, 0]
+            y2 = p2[i, 1]
+            ex0 = e00 * x1 + e01 * y1 + e02
+            ex1 = e10 * x1 + e11 * y1 + e12
+            ex2 = e20 * x1 + e21 * y1 + e22
+            etx0 = e00 * x2 + e10 * y2 + e20
+            etx1 = e01 * x2 + e11 * y2 + e21
+            num = x2 * ex0 + y2 * ex1 + ex2
+            den = ex0 * ex0 + ex1 * ex1 + etx0 * etx0 + etx1 * etx1
+            out[i] = num * num / max(den, 1e-12)
+    
+    # 型を固定して事前コンパイル（呼び出しごとの型ディスパッチを省く）
+    # max_dist=inf やNaN点（w≈0）の比較を正しく扱うため fastmath は使わない
+    @njit('boolean[::1](float64[:, ::1], float64[:, ::1], float64[::1], float64, float64)',
+          parallel=True, cache=True)
+    def _cheirality_kernel(P, R, t, z_thresh, max_dist):
+        """カメラ座標系のZと原点からの距離を1パスで判定したマスクを返す"""
+        max_dist2 = max_dist * max_dist
+        mask = np.empty(P.shape[0], dtype=np.bool_)
+        for i in prange(P.shape[0]):
+            x = P[i, 0]
+            y = P[i, 1]
+            z = P[i, 2]
+            z_cam = R[2, 0] * x + R[2, 1] * y + R[2, 2] * z + t[2]
+            d2 = x * x + y * y + z * z
+            mask[i] = (z_cam > z_thresh) and (d2 < max_dist2)
+        return mask
+    
+    @njit(parallel=True, cache=True)
+    def _triangulate_cheirality_kernel(P1, P2, pts1, pts2, R1, t1, R2, t2, z_thresh, max_dist):
+        """点ごとの線形三角測量（DLT）と両カメラのCheirality判定を行い、有効な点だけを詰めて返す
+        
+        Returns:
+            (有効な3D点 (M, 3) float32, マスク (N,))
+        """
+        n = pts1.shape[1]
+        points = np.empty((n, 3), dtype=np.float64)
+        mask = np.empty(n, dtype=np.bool_)
+        max_dist2 = max_dist * max_dist
+        for i in prange(n):
+            A = np.empty((4, 4), dtype=np.float64)
+            for j in range(4):
+                A[0, j] = pts1[0, i] * P1[2, j] - P1[0, j]
+                A[1, j] = pts1[1, i] * P1[2, j] - P1[1, j]
+                A[2, j] = pts2[0, i] * P2[2, j] - P2[0, j]
+                A[3, j] = pts2[1, i] * P2[2, j] - P2[1, j]
+            # 最小特異値に対応する右特異ベクトルが同次座標の解
+            _, _, vt = np.linalg.svd(A)
+            w = vt[3, 3]
+            if w == 0.0:
+                mask[i] = False
+                continue
+            x = vt[3, 0] / w
+            y = vt[3, 1] / w
+            z = vt[3, 2] / w
+            points[i, 0] = x
+            points[i, 1] = y
+            points[i, 2] = z
+            z_cam1 = R1[2, 0] * x + R1[2, 1] * y + R1[2, 2] * z + t1[2]
+            z_cam2 = R2[2, 0] * x + R2[2, 1] * y + R2[2, 2] * z + t2[2]
+            mask[i] = (z_cam1 > z_thresh) and (z_cam2 > z_thresh) and (x * x + y * y + z * z < max_dist2)
+        
+        # 有効な点だけを出力配列に詰める（出力の確保は1回）
+        count = 0
+        for i in range(n):
+            if mask[i]:
+                count += 1
+        valid = np.empty((count, 3), dtype=np.float32)
+        k = 0
+        for i in range(n):
+            if mask[i]:
+                valid[k, 0] = points[i, 0]
+                valid[k, 1] = points[i, 1]
+                valid[k, 2] = points[i, 2]
+                k += 1
+        return valid, mask
+
+
+def _cheirality_mask(points_3d: np.ndarray, R: np.ndarray, t: np.ndarray,
+                     z_threshold: float, max_distance: float) -> np.ndarray:
+    """Cheirality条件（Z座標・距離）を満たす点のマスクを作成"""
+    t = np.ascontiguousarray(t, dtype=np.float64).reshape(3)
+    if NUMBA_AVAILABLE:
+        return _cheirality_kernel(np.ascontiguousarray(points_3d, dtype=np.float64),
+                                  np.ascontiguousarray(R, dtype=np.float64), t,
+                                  float(z_threshold), float(max_distance))
+    
+    # カメラ座標系のZ成分のみ計算（R[2]との内積）
+    z_cam = points_3d @ R[2] + t[2]
+    d2 = np.einsum('ij,ij->i', points_3d, points_3d)
+    return (z_cam > z_threshold) & (d2 < max_distance * max_distance)
+
+
+def _build_match_count_matrix(image_indices: List[int],
+                              matches_dict: Dict[Tuple[int, int], List[cv2.DMatch]]) -> Tuple[Dict[int, int], np.ndarray]:
+    """画像ペアごとのマッチング数を (K, K) の行列にまとめる
+    
+    count[i, j] は (画像i, 画像j) のキーがあればその件数、無ければ (画像j, 画像i) の件数。
+    
+    Returns:
+        (画像インデックス → 行列の添字の辞書, マッチング数行列)
+    """
+    idx_of = {img_idx: i for i, img_idx in enumerate(image_indices)}
+    num_images = len(image_indices)
+    counts = np.zeros((num_images, num_images), dtype=np.int32)
+    has_key = np.zeros((num_images, num_images), dtype=bool)
+    for (img1, img2), matches in matches_dict.items():
+        if img1 in idx_of and img2 in idx_of:
+            i, j = idx_of[img1], idx_of[img2]
+            counts[i, j] = len(matches)
+            has_key[i, j] = True
+    counts = np.where(has_key, counts, counts.T)
+    return idx_of, counts
+
+
+class PoseTable:
+    """姿勢をSoA形式（回転行列・並進ベクトルの配列）で保持するクラス
+    
+    全カメラに対する変換を einsum 1回で行えるよう、R と t を (K, 3, 3) / (K, 3) の
+    配列にまとめて保持する。従来の辞書形式は poses_dict で参照できる。
+    """
+    
+    def __init__(self, img_ids: List[int], R_stack: np.ndarray, t_stack: np.ndarray):
+        """初期化
+        
+        Args:
+            img_ids: 画像インデックスのリスト（行の順序）
+            R_stack: 回転行列 (K, 3, 3)
+            t_stack: 並進ベクトル (K, 3)
+        """
+        self.img_ids = list(img_ids)
+        self.R_stack = np.asarray(R_stack, dtype=np.float64).reshape(-1, 3, 3)
+        self.t_stack = np.asarray(t_stack, dtype=np.float64).reshape(-1, 3)
+        self.id_to_row = {img_idx: row for row, img_idx in enumerate(self.img_ids)}
+        # R^T とカメラ中心 -R^T t は姿勢の更新時にだけ計算し、参照時は再計算しない
+        self.RT_stack = np.ascontiguousarray(self.R_stack.transpose(0, 2, 1))
+        self.center_stack = -np.einsum('kij,kj->ki', self.RT_stack, self.t_stack)
+        self._poses_dict: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None
+    
+    @classmethod
+    def from_dict(cls, poses_dict: Dict[int, Tuple[np.ndarray, np.ndarray]]) -> 'PoseTable':
+        """姿勢辞書から作成"""
+        img_ids = list(poses_dict.keys())
+        if not img_ids:
+            return cls([], np.empty((0, 3, 3)), np.empty((0, 3)))
+        R_stack = np.stack([np.asarray(poses_dict[idx][0], dtype=np.float64) for idx in img_ids])
+        t_stack = np.stack([np.asarray(poses_dict[idx][1], dtype=np.float64).reshape(3) for idx in img_ids])
+        return cls(img_ids, R_stack, t_stack)
+    
+    def __len__(self) -> int:
+        return len(self.img_ids)
+    
+    def centers(self) -> np.ndarray:
+        """全カメラの中心 -R^T t (K, 3)（キャッシュ済み）"""
+        return self.center_stack
+    
+    def set_pose(self, img_idx: int, R: np.ndarray, t: np.ndarray):
+        """姿勢を設定し、R^T とカメラ中心も合わせて更新
+        
+        Args:
+            img_idx: 画像インデックス（未登録なら行を追加）
+            R: 回転行列
+            t: 並進ベクトル
+        """
+        R = np.asarray(R, dtype=np.float64).reshape(3, 3)
+        t = np.asarray(t, dtype=np.float64).reshape(3)
+        row = self.id_to_row.get(img_idx)
+        if row is None:
+            row = len(self.img_ids)
+            self.img_ids.append(img_idx)
+            self.id_to_row[img_idx] = row
+            self.R_stack = np.concatenate([self.R_stack, R[None]])
+            self.RT_stack = np.concatenate([self.RT_stack, R.T[None]])
+            self.t_stack = np.concatenate([self.t_stack, t[None]])
+            self.center_stack = np.concatenate([self.center_stack, (-R.T @ t)[None]])
+            # 配列を作り直したため辞書ビューも作り直す
+            self._poses_dict = None
+            return
+        
+        self.R_stack[row] = R
+        self.RT_stack[row] = R.T
+        self.t_stack[row] = t
+        self.center_stack[row] = -R.T @ t
+    
+    @property
+    def poses_dict(self) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """従来の辞書形式のビュー（初回参照時に作成、各要素は配列のビュー）"""
+        if self._poses_dict is None:
+            self._poses_dict = {img_idx: (self.R_stack[row], self.t_stack[row])
+                                for row, img_idx in enumerate(self.img_ids)}
+        return self._poses_dict
 
 
 class PoseEstimator:
     """カメラ姿勢推定クラス"""
     
-    def __init__(self, ransac_threshold: float = 8.0, confidence: float = 0.99):
+    def __init__(self, ransac_threshold: float = 1.0, confidence: float = 0.99,
+                 max_iters: int = 1000, adaptive_threshold: bool = True):
         """初期化
         
         Args:
-            ransac_threshold: RANSACの閾値（ピクセル）
+            ransac_threshold: RANSAC (MAGSAC) の閾値（ピクセル、適応閾値を使わない場合）
             confidence: RANSACの信頼度
+            max_iters: RANSACの最大反復回数
+            adaptive_threshold: インライア残差から閾値を適応的に決めるかどうか
         """
         self.ransac_threshold = ransac_threshold
         self.confidence = confidence
-        
-        print(f"姿勢推定器を初期化: RANSAC threshold={ransac_threshold}, confidence={confidence}")
+        self.max_iters = max_iters
+        self.adaptive_threshold = adaptive_threshold
+        
+        # 前の画像ペアで決めた適応閾値（次のペアの初期値）
+        self._adaptive_tau: Optional[float] = None
+        
+        # 並進スケール（configure で決定し、カメラ行列・メタデータが変わるまで使い回す）
+        self._focal_length_mm: Optional[float] = None
+        self._target_distance: Optional[float] = None
+        self._configured_camera_matrix: Optional[np.ndarray] = None
+        self._configured_metadata: Optional[Dict[int, Dict]] = None
+        
+        # 三角測量用のバッファ（[R|t]、投影行列、同次座標）
+        self._Rt1 = np.empty((3, 4))
+        self._Rt2 = np.empty((3, 4))
+        self._P1 = np.empty((3, 4))
+        self._P2 = np.empty((3, 4))
+        self._points_4d_buffer: Optional[np.ndarray] = None
+        
+        logger.info("姿勢推定器を初期化: RANSAC threshold=%s, confidence=%s, max_iters=%s", ransac_threshold, confidence, max_iters)
     
     def estimate_camera_matrix_from_metadata(self, metadata_dict: Dict[int, Dict]) -> np.ndarray:
         """メタデータからカメラ行列を推定
@@ -71,30 +386,94 @@ class PoseEstimator:
             (基本行列, インライアのインデックス)
         """
         if len(pts1) < 8 or len(pts2) < 8:
-            print("対応点が不足しています（最低8点必要）")
+            logger.debug("対応点が不足しています（最低8点必要）")
             return None, []
         
         try:
-            # 基本行列を推定
-            E, mask = cv2.findEssentialMat(pts1, pts2, camera_matrix, 
-                                         method=cv2.RANSAC, 
-                                         prob=self.confidence, 
-                                         threshold=self.ransac_threshold)
+            # 対応点を一度だけ正規化座標に変換（RANSACの各反復での正規化を省く）
+            K = np.asarray(camera_matrix, dtype=np.float64)
+            focal = (K[0, 0] + K[1, 1]) / 2
+            pts1n = cv2.undistortPoints(np.asarray(pts1, dtype=np.float64).reshape(-1, 1, 2), K, None).reshape(-1, 2)
+            pts2n = cv2.undistortPoints(np.asarray(pts2, dtype=np.float64).reshape(-1, 1, 2), K, None).reshape(-1, 2)
+            
+            # 基本行列を推定（適応閾値が有効なら2パス）
+            if self.adaptive_threshold:
+                E, mask = self._adaptive_threshold_findE(pts1n, pts2n, focal)
+            else:
+                E, mask = self._find_essential_mat(pts1n, pts2n, self.ransac_threshold, focal)
             
             if E is None:
-                print("基本行列の推定に失敗しました")
+                logger.debug("基本行列の推定に失敗しました")
                 return None, []
             
             # インライアのインデックスを取得
             inliers = np.where(mask.ravel() == 1)[0].tolist()
             
-            print(f"基本行列推定: {len(pts1)} → {len(inliers)} インライア")
+            logger.debug("基本行列推定: %d → %d インライア", len(pts1), len(inliers))
             return E, inliers
             
         except Exception as e:
-            print(f"基本行列推定エラー: {e}")
+            logger.warning("基本行列推定エラー: %s", e)
             return None, []
     
+    def _find_essential_mat(self, pts1n: np.ndarray, pts2n: np.ndarray,
+                            threshold: float, focal: float) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """正規化座標の対応点から、指定した閾値（ピクセル）で基本行列を1回推定"""
+        # 正規化座標なのでカメラ行列は単位行列、閾値は焦点距離で割って正規化座標の単位にする
+        # USAC_MAGSACはノイズスケールを周辺化するため少ない反復で収束
+        if USAC_AVAILABLE:
+            E, mask = cv2.findEssentialMat(pts1n, pts2n, _IDENTITY_K, 
+                                         method=ESSENTIAL_MAT_METHOD, 
+                                         prob=self.confidence, 
+                                         threshold=threshold / focal,
+                                         maxIters=self.max_iters)
+        else:
+            E, mask = cv2.findEssentialMat(pts1n, pts2n, _IDENTITY_K, 
+                                         method=ESSENTIAL_MAT_METHOD, 
+                                         prob=self.confidence, 
+                                         threshold=threshold / focal)
+        
+        # 複数解が返された場合は最初の解を使用
+        if E is not None and E.shape[0] > 3:
+            E = E[:3]
+        return E, mask
+    
+    def _adaptive_threshold_findE(self, pts1n: np.ndarray, pts2n: np.ndarray,
+                                  focal: float) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """ADAPT方式の適応閾値で基本行列を推定
+        
+        緩い閾値で1回推定し、インライアのSampson残差の分位点から閾値を決めて再推定する。
+        決めた閾値は次の画像ペアの初期値として保持する。
+        """
+        # 1回目: 緩い閾値（前回の閾値があればその2倍を初期値にする）
+        if self._adaptive_tau is not None:
+            loose_threshold = min(ADAPTIVE_INITIAL_THRESHOLD, 2.0 * self._adaptive_tau)
+        else:
+            loose_threshold = ADAPTIVE_INITIAL_THRESHOLD
+        E, mask = self._find_essential_mat(pts1n, pts2n, loose_threshold, focal)
+        if E is None or mask is None:
+            return E, mask
+        
+        inlier_mask = mask.ravel().astype(bool)
+        if np.count_nonzero(inlier_mask) < 8:
+            return E, mask
+        
+        # インライアのSampson残差をピクセル単位で計算
+        residuals = np.sqrt(sampson_residuals(E, pts1n[inlier_mask], pts2n[inlier_mask])) * focal
+        
+        # 2回目: 分位点から決めた閾値で再推定
+        # 残差は非負で上限が既知のため、ソートせずヒストグラムで分位点を求める
+        upper = max(loose_threshold, float(residuals.max()))
+        quantile = _histogram_quantile(residuals, ADAPTIVE_QUANTILE, upper)
+        tau = max(ADAPTIVE_DISCOUNT * quantile, ADAPTIVE_MIN_THRESHOLD)
+        E_refined, mask_refined = self._find_essential_mat(pts1n, pts2n, tau, focal)
+        if E_refined is None:
+            return E, mask
+        
+        self._adaptive_tau = tau
+        logger.debug("適応閾値: %.2f → %.2f px", loose_threshold, tau)
+        return E_refined, mask_refined
+    
     def recover_pose(self, pts1: np.ndarray, pts2: np.ndarray, 
                     essential_matrix: np.ndarray, camera_matrix: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], List[int]]:
         """姿勢を復元
@@ -123,47 +502,56 @@ class PoseEstimator:
                 # OpenCV 3.x: (R, t, mask)
                 R, t, mask = result
             else:
-                print(f"予期しない戻り値: {len(result)} 個の要素")
+                logger.warning("予期しない戻り値: %d 個の要素", len(result))
                 return None, None, []
             
             if R is None or t is None:
-                print("姿勢復元に失敗しました")
+                logger.debug("姿勢復元に失敗しました")
                 return None, None, []
             
             # インライアのインデックスを取得
             inliers = np.where(mask.ravel() == 1)[0].tolist()
             
-            print(f"姿勢復元: 回転行列 shape={R.shape}, 並進ベクトル shape={t.shape}")
-            print(f"インライア数: {len(inliers)}")
+            logger.debug("姿勢復元: 回転行列 shape=%s, 並進ベクトル shape=%s, インライア数: %d", R.shape, t.shape, len(inliers))
             
             return R, t, inliers
             
         except Exception as e:
-            print(f"姿勢復元エラー: {e}")
+            logger.warning("姿勢復元エラー: %s", e)
             return None, None, []
     
-    def estimate_pose_from_matches(self, keypoints1: List[cv2.KeyPoint], 
-                                 keypoints2: List[cv2.KeyPoint],
-                                 matches: List[cv2.DMatch], 
+    def estimate_pose_from_matches(self, keypoints1: Union[List[cv2.KeyPoint], np.ndarray], 
+                                 keypoints2: Union[List[cv2.KeyPoint], np.ndarray],
+                                 matches: Union[List[cv2.DMatch], np.ndarray], 
                                  camera_matrix: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], List[int]]:
         """マッチング結果から姿勢を推定
         
         Args:
-            keypoints1: 1つ目の画像の特徴点
-            keypoints2: 2つ目の画像の特徴点
-            matches: マッチング結果
+            keypoints1: 1つ目の画像の特徴点（または座標配列 (N, 2)）
+            keypoints2: 2つ目の画像の特徴点（または座標配列 (N, 2)）
+            matches: マッチング結果（DMatchリストまたは構造化配列）
             camera_matrix: カメラ行列
             
         Returns:
             (回転行列, 並進ベクトル, インライアのインデックス)
         """
-        if not matches:
-            print("マッチング結果がありません")
+        if len(matches) == 0:
+            logger.debug("マッチング結果がありません")
+            return None, None, []
+        
+        # 基本行列推定には最低8点必要なため、座標配列を作る前に打ち切る
+        if len(matches) < 8:
+            logger.debug("対応点が不足しています（最低8点必要）")
             return None, None, []
         
-        # 対応点の座標を取得
-        pts1 = np.float32([keypoints1[m.queryIdx].pt for m in matches])
-        pts2 = np.float32([keypoints2[m.trainIdx].pt for m in matches])
+        # 特徴点座標配列（キャッシュ済みでなければここで作成）
+        pts_all1 = keypoints1 if isinstance(keypoints1, np.ndarray) else keypoints_to_xy(keypoints1)
+        pts_all2 = keypoints2 if isinstance(keypoints2, np.ndarray) else keypoints_to_xy(keypoints2)
+        
+        # 対応点の座標をインデックス配列で一括取得
+        query_idx, train_idx = _match_index_arrays(matches)
+        pts1 = pts_all1[query_idx]
+        pts2 = pts_all2[train_idx]
         
         # 基本行列を推定
         E, inliers_E = self.estimate_essential_matrix(pts1, pts2, camera_matrix)
@@ -193,7 +581,7 @@ class PoseEstimator:
             (回転ベクトル, 並進ベクトル)
         """
         if len(points_3d) < 4 or len(points_2d) < 4:
-            print("PnP姿勢推定: 対応点が不足しています（最低4点必要）")
+            logger.debug("PnP姿勢推定: 対応点が不足しています（最低4点必要）")
             return None, None
         
         if dist_coeffs is None:
@@ -203,33 +591,37 @@ class PoseEstimator:
             # PnP姿勢推定
             success, rvec, tvec, inliers = cv2.solvePnPRansac(
                 points_3d, points_2d, camera_matrix, dist_coeffs,
-                # # reprojectionError=8.0, confidence=0.99
+                iterationsCount=PNP_ITERATIONS,
+                reprojectionError=PNP_REPROJECTION_ERROR,
+                confidence=PNP_CONFIDENCE,
+                flags=PNP_METHOD
             )
             
             if not success:
-                print("PnP姿勢推定に失敗しました")
+                logger.debug("PnP姿勢推定に失敗しました")
                 return None, None
             
-            # 回転ベクトル転行列に変換
+            # 回転ベクトルを回転行列に変換
             R, _ = cv2.Rodrigues(rvec)
             
             # PnP姿勢推定後に正規化（異常に大きな並進ベクトルを調整）
             if metadata_dict is not None:
                 tvec_normalized = self._normalize_translation(tvec, camera_matrix, metadata_dict)
-                print(f"PnP姿勢推定成功（正規化済み）: {len(inliers)} インライア")
+                logger.debug("PnP姿勢推定成功（正規化済み）: %d インライア", len(inliers))
                 return R, tvec_normalized
             else:
-                print(f"PnP姿勢推定成功: {len(inliers)} インライア")
+                logger.debug("PnP姿勢推定成功: %d インライア", len(inliers))
                 return R, tvec
             
         except Exception as e:
-            print(f"PnP姿勢推定エラー: {e}")
+            logger.warning("PnP姿勢推定エラー: %s", e)
             return None, None
     
     def triangulate_points(self, pts1: np.ndarray, pts2: np.ndarray,
                           R1: np.ndarray, t1: np.ndarray,
                           R2: np.ndarray, t2: np.ndarray,
-                          camera_matrix: np.ndarray) -> np.ndarray:
+                          camera_matrix: np.ndarray,
+                          soa: bool = False) -> np.ndarray:
         """三角測量で3D点を計算
         
         Args:
@@ -240,29 +632,160 @@ class PoseEstimator:
             R2: 2つ目のカメラの回転行列
             t2: 2つ目のカメラの並進ベクトル
             camera_matrix: カメラ行列
+            soa: Trueの場合、対応点は (2, N) のC連続配列（転置コピーなしでOpenCVに渡す）
             
         Returns:
-            3D点の座標
+            3D点の座標 (N, 3)
         """
-        if len(pts1) == 0 or len(pts2) == 0:
+        if np.size(pts1) == 0 or np.size(pts2) == 0:
             return np.array([])
         
         try:
-            # 投影行列を作成
-            P1 = camera_matrix @ np.hstack([R1, t1.reshape(3, 1)])
-            P2 = camera_matrix @ np.hstack([R2, t2.reshape(3, 1)])
+            # 投影行列を作成（[R|t] と P はバッファを使い回す）
+            self._Rt1[:, :3] = R1
+            self._Rt1[:, 3] = t1.reshape(3)
+            self._Rt2[:, :3] = R2
+            self._Rt2[:, 3] = t2.reshape(3)
+            K = np.asarray(camera_matrix, dtype=np.float64)
+            np.matmul(K, self._Rt1, out=self._P1)
+            np.matmul(K, self._Rt2, out=self._P2)
+        except Exception as e:
+            logger.warning("三角測量エラー: %s", e)
+            return np.array([])
+        
+        return self.triangulate_points_P(pts1, pts2, self._P1, self._P2, soa=soa)
+    
+    def projection_matrices(self, poses_dict: Dict[int, Tuple[np.ndarray, np.ndarray]],
+                            camera_matrix: np.ndarray) -> Dict[int, np.ndarray]:
+        """カメラごとの投影行列 P = K [R|t] をまとめて計算
+        
+        Args:
+            poses_dict: カメラ姿勢辞書
+            camera_matrix: カメラ行列
             
-            # 三角測量
-            points_4d = cv2.triangulatePoints(P1, P2, pts1.T, pts2.T)
-            points_3d = (points_4d[:3] / points_4d[3]).T
+        Returns:
+            画像インデックス → 投影行列 (3, 4) の辞書
+        """
+        if not poses_dict:
+            return {}
+        img_ids = list(poses_dict.keys())
+        Rt_stack = np.empty((len(img_ids), 3, 4), dtype=np.float64)
+        for i, img_idx in enumerate(img_ids):
+            R, t = poses_dict[img_idx]
+            Rt_stack[i, :, :3] = R
+            Rt_stack[i, :, 3] = np.reshape(t, 3)
+        P_stack = np.matmul(np.asarray(camera_matrix, dtype=np.float64), Rt_stack)
+        return dict(zip(img_ids, P_stack))
+    
+    def triangulate_points_P(self, pts1: np.ndarray, pts2: np.ndarray,
+                             P1: np.ndarray, P2: np.ndarray,
+                             soa: bool = False) -> np.ndarray:
+        """作成済みの投影行列で三角測量
+        
+        Args:
+            pts1: 1つ目の画像の対応点
+            pts2: 2つ目の画像の対応点
+            P1: 1つ目のカメラの投影行列 (3, 4)
+            P2: 2つ目のカメラの投影行列 (3, 4)
+            soa: Trueの場合、対応点は (2, N) のC連続配列（転置コピーなしでOpenCVに渡す）
             
-            print(f"三角測量: {len(pts1)} 点 → {len(points_3d)} 3D点")
+        Returns:
+            3D点の座標 (N, 3)
+        """
+        if np.size(pts1) == 0 or np.size(pts2) == 0:
+            return np.array([])
+        
+        try:
+            # OpenCVは (2, N) を要求するため、SoA形式ならそのまま渡す
+            if not soa:
+                pts1 = pts1.T
+                pts2 = pts2.T
+            
+            # 三角測量（OpenCVは入力点と同じ型の (4, N) を出力するため、同じ型のC連続な出力先を渡す）
+            num_input = pts1.shape[1]
+            if (self._points_4d_buffer is None or self._points_4d_buffer.dtype != pts1.dtype
+                    or self._points_4d_buffer.size < 4 * num_input):
+                self._points_4d_buffer = np.empty(4 * num_input, dtype=pts1.dtype)
+            dst = self._points_4d_buffer[:4 * num_input].reshape(4, num_input)
+            points_4d = cv2.triangulatePoints(P1, P2, pts1, pts2, dst)
+            if not np.shares_memory(points_4d, dst):
+                # OpenCVが出力を再確保した場合はバッファを使い回さない
+                logger.debug("三角測量: 出力バッファが使用されませんでした (%s)", points_4d.dtype)
+                self._points_4d_buffer = None
+            
+            # 同次座標の除算結果を (N, 3) の新しい配列へ直接書き込む（転置ビューを出力先にする）
+            num_points = points_4d.shape[1]
+            points_3d = np.empty((num_points, 3), dtype=points_4d.dtype)
+            np.divide(points_4d[:3], points_4d[3], out=points_3d.T)
+            
+            logger.debug("三角測量: %d 点 → %d 3D点", num_points, len(points_3d))
             return points_3d
             
         except Exception as e:
-            print(f"三角測量エラー: {e}")
+            logger.warning("三角測量エラー: %s", e)
             return np.array([])
     
+    def triangulate_with_cheirality(self, pts1: np.ndarray, pts2: np.ndarray,
+                                    R1: np.ndarray, t1: np.ndarray,
+                                    R2: np.ndarray, t2: np.ndarray,
+                                    camera_matrix: np.ndarray,
+                                    z_threshold: float = -0.1,
+                                    max_distance: float = 1000.0,
+                                    P1: Optional[np.ndarray] = None,
+                                    P2: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """三角測量と（緩い）Cheirality判定をまとめて実行
+        
+        Numbaが利用可能な場合は1つのカーネルで点ごとに三角測量と判定を行い、
+        有効な点だけを詰めた配列を返す（全点分の3D座標を呼び出し側に渡さない）。
+        
+        Args:
+            pts1: 1つ目の画像の対応点 (2, N)
+            pts2: 2つ目の画像の対応点 (2, N)
+            R1: 1つ目のカメラの回転行列
+            t1: 1つ目のカメラの並進ベクトル
+            R2: 2つ目のカメラの回転行列
+            t2: 2つ目のカメラの並進ベクトル
+            camera_matrix: カメラ行列
+            z_threshold: 両カメラ座標系でのZ座標の閾値
+            max_distance: 原点からの最大距離
+            P1: 1つ目のカメラの投影行列（作成済みなら渡す。未指定なら K [R1|t1] を計算）
+            P2: 2つ目のカメラの投影行列（作成済みなら渡す。未指定なら K [R2|t2] を計算）
+            
+        Returns:
+            (有効な3D点の座標 (M, 3) float32, 有効な点のマスク (N,))
+        """
+        if np.size(pts1) == 0 or np.size(pts2) == 0:
+            return np.empty((0, 3), dtype=np.float32), np.empty(0, dtype=bool)
+        
+        K = np.asarray(camera_matrix, dtype=np.float64)
+        if P1 is None:
+            P1 = K @ np.hstack([R1, np.reshape(t1, (3, 1))])
+        if P2 is None:
+            P2 = K @ np.hstack([R2, np.reshape(t2, (3, 1))])
+        
+        if NUMBA_AVAILABLE:
+            valid_points_3d, mask = _triangulate_cheirality_kernel(
+                np.ascontiguousarray(P1, dtype=np.float64),
+                np.ascontiguousarray(P2, dtype=np.float64),
+                np.ascontiguousarray(pts1, dtype=np.float64),
+                np.ascontiguousarray(pts2, dtype=np.float64),
+                np.ascontiguousarray(R1, dtype=np.float64),
+                np.ascontiguousarray(t1, dtype=np.float64).reshape(3),
+                np.ascontiguousarray(R2, dtype=np.float64),
+                np.ascontiguousarray(t2, dtype=np.float64).reshape(3),
+                float(z_threshold), float(max_distance)
+            )
+        else:
+            points_3d = self.triangulate_points_P(pts1, pts2, P1, P2, soa=True)
+            if len(points_3d) == 0:
+                return np.empty((0, 3), dtype=np.float32), np.empty(0, dtype=bool)
+            mask = _cheirality_mask(points_3d, R1, t1, z_threshold, max_distance)
+            mask &= points_3d @ R2[2] + np.reshape(t2, 3)[2] > z_threshold
+            valid_points_3d = points_3d[mask].astype(np.float32, copy=False)
+        
+        logger.debug("三角測量+Cheirality: %d → %d 有効な点", len(mask), len(valid_points_3d))
+        return valid_points_3d, mask
+    
     def check_cheirality(self, points_3d: np.ndarray, R: np.ndarray, t: np.ndarray) -> np.ndarray:
         """Cheirality制約をチェック（3D点がカメラの前方にあるか）
         
@@ -277,13 +800,10 @@ class PoseEstimator:
         if len(points_3d) == 0:
             return np.array([])
         
-        # カメラ座標系での3D点を計算
-        points_cam = (R @ points_3d.T + t.reshape(3, 1)).T
-        
         # Z座標が正（カメラの前方）の点を選択
-        valid_indices = np.where(points_cam[:, 2] > 0)[0]
+        valid_indices = np.flatnonzero(_cheirality_mask(points_3d, R, t, 0.0, np.inf))
         
-        print(f"Cheirality制約: {len(points_3d)} → {len(valid_indices)} 有効な点")
+        logger.debug("Cheirality制約: %d → %d 有効な点", len(points_3d), len(valid_indices))
         return valid_indices
     
     def check_cheirality_relaxed(self, points_3d: np.ndarray, R: np.ndarray, t: np.ndarray) -> np.ndarray:
@@ -300,27 +820,15 @@ class PoseEstimator:
         if len(points_3d) == 0:
             return np.array([])
         
-        # カメラ座標系での3D点を計算
-        points_cam = (R @ points_3d.T + t.reshape(3, 1)).T
-        
         # より緩い制約: Z座標が少し負でも許容
         # また、点が無限遠に近すぎないこともチェック
         z_threshold = -0.1  # より緩いZ座標の閾値
         max_distance = 1000.0  # 最大距離の閾値
         
-        # 距離を計算
-        distances = np.linalg.norm(points_3d, axis=1)
-        
-        # 条件をチェック
-        valid_z = points_cam[:, 2] > z_threshold
-        valid_distance = distances < max_distance
-        valid_points = valid_z & valid_distance
-        
-        valid_indices = np.where(valid_points)[0]
+        # Z座標条件と距離条件を1パスで判定
+        valid_indices = np.flatnonzero(_cheirality_mask(points_3d, R, t, z_threshold, max_distance))
         
-        print(f"緩いCheirality制約: {len(points_3d)} → {len(valid_indices)} 有効な点")
-        print(f"  Z座標条件: {np.sum(valid_z)} 点")
-        print(f"  距離条件: {np.sum(valid_distance)} 点")
+        logger.debug("緩いCheirality制約: %d → %d 有効な点", len(points_3d), len(valid_indices))
         
         return valid_indices
     
@@ -328,7 +836,8 @@ class PoseEstimator:
                              descriptors_dict: Dict[int, np.ndarray],
                              matches_dict: Dict[Tuple[int, int], List[cv2.DMatch]],
                              camera_matrix: np.ndarray,
-                             metadata_dict: Optional[Dict[int, Dict]] = None) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+                             metadata_dict: Optional[Dict[int, Dict]] = None,
+                             keypoints_xy_dict: Optional[Dict[int, np.ndarray]] = None) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
         """初期姿勢を推定
         
         Args:
@@ -337,22 +846,26 @@ class PoseEstimator:
             matches_dict: マッチング結果辞書
             camera_matrix: カメラ行列
             metadata_dict: メタデータ辞書（焦点距離を取得するため）
+            keypoints_xy_dict: 特徴点座標配列 (N, 2) の辞書（抽出時のキャッシュ）
         Returns:
             画像インデックスをキーとした姿勢辞書
         """
         poses_dict = {}
         
-        print("初期姿勢推定を開始")
+        logger.info("初期姿勢推定を開始")
         
         # 最初の画像を基準とする（SfMの標準的なアプローチ）
         image_indices = list(keypoints_dict.keys())
         if len(image_indices) < 2:
-            print("画像が不足しています（最低2枚必要）")
+            logger.warning("画像が不足しています（最低2枚必要）")
             return poses_dict
         
+        # 画像ペアごとのマッチング数を一度だけ行列化
+        match_counts = _build_match_count_matrix(image_indices, matches_dict)
+        
         # 最初の画像を基準とする（SfMの標準的なアプローチ）
         poses_dict[image_indices[0]] = (np.eye(3), np.zeros(3))
-        print(f"基準画像 {image_indices[0]}: 原点に固定")
+        logger.info("基準画像 %s: 原点に固定", image_indices[0])
         
         # 2番目の画像の姿勢を推定
         if len(image_indices) >= 2:
@@ -360,40 +873,48 @@ class PoseEstimator:
             
             # マッチング結果を取得
             if (idx1, idx2) in matches_dict:
-                matches = matches_dict[(idx1, idx2)]
+                matches = matches_to_array(matches_dict[(idx1, idx2)])
             elif (idx2, idx1) in matches_dict:
-                matches = matches_dict[(idx2, idx1)]
-                # マッチングの順序を反転
-                for match in matches:
-                    match.queryIdx, match.trainIdx = match.trainIdx, match.queryIdx
+                reversed_matches = matches_to_array(matches_dict[(idx2, idx1)])
+                # マッチングの順序を反転（元のマッチング結果は変更しない）
+                matches = np.empty_like(reversed_matches)
+                matches['q'] = reversed_matches['t']
+                matches['t'] = reversed_matches['q']
+                matches['d'] = reversed_matches['d']
             else:
-                print(f"画像 {idx1} と {idx2} のマッチングが見つかりません")
+                logger.warning("画像 %s と %s のマッチングが見つかりません", idx1, idx2)
                 return poses_dict
             
-            print(f"画像 {idx1} と {idx2} の間で {len(matches)} マッチングを使用")
+            logger.info("画像 %s と %s の間で %d マッチングを使用", idx1, idx2, len(matches))
             
-            # 姿勢を推定
+            # 姿勢を推定（キャッシュ済みの座標配列があれば使用）
+            if keypoints_xy_dict is not None and idx1 in keypoints_xy_dict and idx2 in keypoints_xy_dict:
+                keypoints1, keypoints2 = keypoints_xy_dict[idx1], keypoints_xy_dict[idx2]
+            else:
+                keypoints1, keypoints2 = keypoints_dict[idx1], keypoints_dict[idx2]
             R, t, inliers = self.estimate_pose_from_matches(
-                keypoints_dict[idx1], keypoints_dict[idx2], matches, camera_matrix
+                keypoints1, keypoints2, matches, camera_matrix
             )
             
             if R is not None and t is not None:
                 poses_dict[idx2] = (R, t.flatten())
-                print(f"画像 {idx2} の姿勢推定成功")
+                logger.info("画像 %s の姿勢推定成功", idx2)
                 
                 # 追加の画像の姿勢を推定（控えめな360度配置）
-                self._estimate_additional_poses(poses_dict, keypoints_dict, matches_dict, camera_matrix, metadata_dict)
+                self._estimate_additional_poses(poses_dict, keypoints_dict, matches_dict, camera_matrix, metadata_dict,
+                                                match_counts=match_counts)
             else:
-                print(f"画像 {idx2} の姿勢推定に失敗")
+                logger.warning("画像 %s の姿勢推定に失敗", idx2)
         
-        print(f"初期姿勢推定完了: {len(poses_dict)} 画像")
+        logger.info("初期姿勢推定完了: %d 画像", len(poses_dict))
         return poses_dict
     
     def _estimate_additional_poses(self, poses_dict: Dict[int, Tuple[np.ndarray, np.ndarray]],
                                  keypoints_dict: Dict[int, List[cv2.KeyPoint]],
                                  matches_dict: Dict[Tuple[int, int], List[cv2.DMatch]],
                                  camera_matrix: np.ndarray,
-                                 metadata_dict: Optional[Dict[int, Dict]] = None):
+                                 metadata_dict: Optional[Dict[int, Dict]] = None,
+                                 match_counts: Optional[Tuple[Dict[int, int], np.ndarray]] = None):
         """追加の画像の姿勢を控えめな360度配置で推定"""
         estimated_images = set(poses_dict.keys())
         all_images = set(keypoints_dict.keys())
@@ -401,75 +922,68 @@ class PoseEstimator:
         # まだ姿勢が推定されていない画像を処理
         remaining_images = all_images - estimated_images
         
-        # 既存のカメラ位置を分析
-        existing_positions = []
-        for img_idx, (R, t) in poses_dict.items():
-            pos = -R.T @ t
-            existing_positions.append((img_idx, pos))
-        
-        # 既存のカメラの平均距離を計算
-        if len(existing_positions) > 0:
-            distances = [np.linalg.norm(pos) for _, pos in existing_positions]
-            avg_distance = np.mean(distances)
-            print(f"既存カメラの平均距離: {avg_distance:.1f}mm")
+        # 既存のカメラの平均距離を計算（カメラ中心を一括計算）
+        if len(poses_dict) > 0:
+            existing_positions = PoseTable.from_dict(poses_dict).centers()
+            avg_distance = np.mean(np.linalg.norm(existing_positions, axis=1))
+            logger.debug("既存カメラの平均距離: %.1fmm", avg_distance)
         else:
             avg_distance = 50.0  # デフォルト距離
         
-        for img_idx in remaining_images:
-            # 既に姿勢が推定された画像とのマッチングを探す
-            best_matches = None
-            best_reference_img = None
-            max_matches = 0
-            
-            for ref_img in estimated_images:
-                if (ref_img, img_idx) in matches_dict:
-                    matches = matches_dict[(ref_img, img_idx)]
-                    if len(matches) > max_matches:
-                        max_matches = len(matches)
-                        best_matches = matches
-                        best_reference_img = ref_img
-                elif (img_idx, ref_img) in matches_dict:
-                    matches = matches_dict[(img_idx, ref_img)]
-                    if len(matches) > max_matches:
-                        max_matches = len(matches)
-                        best_matches = matches
-                        best_reference_img = ref_img
-            
-            if best_matches and len(best_matches) >= 10:  # 最低10マッチング必要
-                print(f"画像 {img_idx} の姿勢推定を試行（{len(best_matches)} マッチング）")
-                
-                # 控えめな360度配置
-                # 画像インデックスに基づいて角度を計算（既存のカメラを避ける）
-                angle = (img_idx - min(all_images)) * (2 * np.pi / len(all_images))
-                radius = avg_distance * 0.8  # 既存の平均距離の80%
-                
-                # 円周上に配置
-                x = radius * np.cos(angle)
-                y = radius * np.sin(angle)
-                z = 0.0
-                
-                # 回転行列（Z軸周りの回転、控えめに）
-                cos_angle = np.cos(angle)
-                sin_angle = np.sin(angle)
-                R = np.array([
-                    [cos_angle, -sin_angle, 0],
-                    [sin_angle, cos_angle, 0],
-                    [0, 0, 1]
-                ])
-                
-                # 並進ベクトル
-                t = np.array([x, y, z])
-                
-                # 正規化（控えめに）
-                if metadata_dict is not None:
-                    t_normalized = self._normalize_translation(t, camera_matrix, metadata_dict)
-                    poses_dict[img_idx] = (R, t_normalized)
-                else:
-                    poses_dict[img_idx] = (R, t)
-                
-                print(f"画像 {img_idx} の姿勢設定成功（角度: {np.degrees(angle):.1f}°, 位置: [{x:.1f}, {y:.1f}, {z:.1f}]）")
+        # 画像ペアごとのマッチング数の行列（未作成ならここで作成）
+        if match_counts is None:
+            match_counts = _build_match_count_matrix(list(keypoints_dict.keys()), matches_dict)
+        idx_of, count_matrix = match_counts
+        
+        # 姿勢推定済みの画像のマスク（行方向）
+        estimated_mask = np.zeros(len(idx_of), dtype=bool)
+        estimated_mask[[idx_of[img] for img in estimated_images if img in idx_of]] = True
+        
+        if not remaining_images:
+            return
+        
+        # 各残り画像について、姿勢推定済み画像との最大マッチング数を一括計算
+        remaining = list(remaining_images)
+        remaining_cols = [idx_of[img_idx] for img_idx in remaining]
+        max_matches = np.where(estimated_mask[:, None], count_matrix[:, remaining_cols], 0).max(axis=0)
+        
+        # 控えめな360度配置を一括計算
+        # 画像インデックスに基づいて角度を計算（既存のカメラを避ける）
+        angles = (np.asarray(remaining, dtype=np.float64) - min(all_images)) * (2 * np.pi / len(all_images))
+        radius = avg_distance * 0.8  # 既存の平均距離の80%
+        cos_a = np.cos(angles)
+        sin_a = np.sin(angles)
+        
+        # 回転行列（Z軸周りの回転、控えめに）
+        Rs = np.zeros((len(remaining), 3, 3))
+        Rs[:, 0, 0] = cos_a
+        Rs[:, 0, 1] = -sin_a
+        Rs[:, 1, 0] = sin_a
+        Rs[:, 1, 1] = cos_a
+        Rs[:, 2, 2] = 1.0
+        
+        # 並進ベクトル（円周上に配置）
+        ts = np.stack([radius * cos_a, radius * sin_a, np.zeros(len(remaining))], axis=1)
+        positions = ts
+        
+        # 正規化（控えめに）
+        if metadata_dict is not None:
+            # 全ての画像が同じ半径の円周上にあるため、一律に目標距離へ拡縮する
+            target_distance = self._get_target_distance(camera_matrix, metadata_dict)
+            if radius > 0:
+                ts = ts * (target_distance / radius)
+            else:
+                ts = np.tile([target_distance, 0.0, 0.0], (len(remaining), 1))
+        
+        for k, img_idx in enumerate(remaining):
+            if max_matches[k] >= 10:  # 最低10マッチング必要
+                poses_dict[img_idx] = (Rs[k], ts[k])
+                if logger.isEnabledFor(logging.DEBUG):
+                    x, y, z = positions[k]
+                    logger.debug("画像 %s の姿勢設定成功（%d マッチング, 角度: %.1f°, 位置: [%.1f, %.1f, %.1f]）",
+                                 img_idx, max_matches[k], np.degrees(angles[k]), x, y, z)
             else:
-                print(f"画像 {img_idx} のマッチングが不足（{max_matches} マッチング）")
+                logger.debug("画像 %s のマッチングが不足（%d マッチング）", img_idx, max_matches[k])
     
     def save_poses(self, poses_dict: Dict[int, Tuple[np.ndarray, np.ndarray]], 
                   output_dir: str):
@@ -482,16 +996,12 @@ class PoseEstimator:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        # 姿勢データを保存
+        # 姿勢データを (K, 3, 3) / (K, 3) の配列にまとめて無圧縮で保存
         poses_file = output_path / "poses.npz"
-        poses_data = {}
-        
-        for image_idx, (R, t) in poses_dict.items():
-            poses_data[f'R_{image_idx}'] = R
-            poses_data[f't_{image_idx}'] = t
-        
-        np.savez_compressed(poses_file, **poses_data)
-        print(f"姿勢データを保存: {output_dir}")
+        pose_table = PoseTable.from_dict(poses_dict)
+        np.savez(poses_file, R=pose_table.R_stack, t=pose_table.t_stack,
+                 ids=np.asarray(pose_table.img_ids, dtype=np.int64))
+        logger.info("姿勢データを保存: %s", output_dir)
     
     def load_poses(self, input_dir: str) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
         """姿勢データを読み込み
@@ -507,23 +1017,84 @@ class PoseEstimator:
         
         poses_file = input_path / "poses.npz"
         if poses_file.exists():
-            poses_data = np.load(poses_file)
-            
-            # 回転行列と並進ベクトルを取得
-            rotation_keys = [key for key in poses_data.files if key.startswith('R_')]
-            
-            for key in rotation_keys:
-                image_idx = int(key.split('_')[1])
-                R = poses_data[key]
-                t = poses_data[f't_{image_idx}']
-                poses_dict[image_idx] = (R, t)
+            with np.load(poses_file) as poses_data:
+                if 'ids' in poses_data.files:
+                    pose_table = PoseTable(poses_data['ids'].tolist(), poses_data['R'], poses_data['t'])
+                    poses_dict = dict(pose_table.poses_dict)
+                else:
+                    # 旧形式（R_{idx} / t_{idx} のキー）
+                    for key in poses_data.files:
+                        if key.startswith('R_'):
+                            image_idx = int(key.split('_')[1])
+                            poses_dict[image_idx] = (poses_data[key], poses_data[f't_{image_idx}'])
         
-        print(f"姿勢データを読み込み: {len(poses_dict)} 画像")
+        logger.info("姿勢データを読み込み: %d 画像", len(poses_dict))
         return poses_dict 
     
+    def configure(self, camera_matrix: np.ndarray, metadata_dict: Optional[Dict[int, Dict]] = None):
+        """カメラ行列とメタデータから並進スケールを一度だけ決定
+        
+        焦点距離（mm）と並進ベクトルの目標距離を保持し、同じカメラ行列・メタデータに対する
+        以降の正規化ではメタデータを参照しない。
+        
+        Args:
+            camera_matrix: カメラ行列
+            metadata_dict: メタデータ辞書（焦点距離を取得するため）
+        """
+        self._focal_length_mm = self._resolve_focal_length_mm(camera_matrix, metadata_dict)
+        # 適切な距離を設定（焦点距離の1.5倍程度）
+        self._target_distance = self._focal_length_mm * 1.5
+        self._configured_camera_matrix = np.array(camera_matrix, dtype=np.float64)
+        self._configured_metadata = metadata_dict
+    
+    def _get_target_distance(self, camera_matrix: np.ndarray,
+                             metadata_dict: Optional[Dict[int, Dict]] = None) -> float:
+        """並進ベクトルの目標距離（未設定、またはカメラ行列・メタデータが変わった場合は configure を実行）"""
+        if (self._target_distance is None
+                or metadata_dict is not self._configured_metadata
+                or not np.array_equal(camera_matrix, self._configured_camera_matrix)):
+            self.configure(camera_matrix, metadata_dict)
+        return self._target_distance
+    
+    def _resolve_focal_length_mm(self, camera_matrix: np.ndarray,
+                                 metadata_dict: Optional[Dict[int, Dict]] = None,
+                                 use_sensor_estimate: bool = True) -> float:
+        """実際の焦点距離（mm）を決定
+        
+        Args:
+            camera_matrix: カメラ行列
+            metadata_dict: メタデータ辞書（焦点距離を取得するため）
+            use_sensor_estimate: メタデータに焦点距離がない場合に画像サイズとセンサーサイズから推定するか
+                （Falseの場合はデフォルト値50mmを使用）
+            
+        Returns:
+            焦点距離（mm）
+        """
+        focal_length_mm = None
+        first_metadata = metadata_dict[next(iter(metadata_dict))] if metadata_dict else {}
+        
+        # 最初の画像のメタデータから焦点距離を取得
+        if first_metadata.get('focal_length') is not None:
+            focal_length_mm = first_metadata['focal_length']
+            logger.info("メタデータから焦点距離を取得: %smm", focal_length_mm)
+        elif use_sensor_estimate and 'image_size' in first_metadata:
+            # カメラ行列の焦点距離（ピクセル単位）と画像サイズから推定
+            # 一般的なAPS-Cセンサーサイズ（23.5 x 15.6mm）を仮定
+            focal_length_pixels = (camera_matrix[0, 0] + camera_matrix[1, 1]) / 2
+            sensor_width_mm = 23.5
+            mm_per_pixel = sensor_width_mm / first_metadata['image_size']['width']
+            focal_length_mm = focal_length_pixels * mm_per_pixel
+            logger.info("センサーサイズから焦点距離を推定: %.1fmm", focal_length_mm)
+        else:
+            # デフォルト値を使用
+            focal_length_mm = 50.0  # 標準レンズ
+            logger.info("デフォルト焦点距離を使用: %smm", focal_length_mm)
+        
+        return float(focal_length_mm)
+    
     def _normalize_translation(self, t: np.ndarray, camera_matrix: np.ndarray, 
                              metadata_dict: Optional[Dict[int, Dict]] = None) -> np.ndarray:
-        """並進ベクトルを適切な距離に正規化
+        """並進ベクトルを適切な距離（焦点距離の1.5倍）に正規化
         
         Args:
             t: 並進ベクトル
@@ -533,150 +1104,66 @@ class PoseEstimator:
         Returns:
             正規化された並進ベクトル
         """
-        # 実際の焦点距離（mm）を取得
-        focal_length_mm = None
-        if metadata_dict:
-            # 最初の画像のメタデータから焦点距離を取得
-            first_metadata = metadata_dict[list(metadata_dict.keys())[0]]
-            if 'focal_length' in first_metadata and first_metadata['focal_length'] is not None:
-                focal_length_mm = first_metadata['focal_length']
-                print(f"メタデータから焦点距離を取得: {focal_length_mm}mm")
-        
-        # メタデータから焦点距離が取得できない場合は、カメラ行列から推定
-        if focal_length_mm is None:
-            # カメラ行列の焦点距離（ピクセル単位）を取得
-            focal_length_pixels = (camera_matrix[0, 0] + camera_matrix[1, 1]) / 2
-            
-            # 画像サイズからmm/pixelの比率を推定
-            # 一般的なデジタルカメラでは、センサーサイズと画像サイズの比率を使用
-            if metadata_dict:
-                first_metadata = metadata_dict[list(metadata_dict.keys())[0]]
-                if 'image_size' in first_metadata:
-                    width = first_metadata['image_size']['width']
-                    height = first_metadata['image_size']['height']
-                    
-                    # 一般的なAPS-Cセンサーサイズ（23.5 x 15.6mm）を仮定
-                    sensor_width_mm = 23.5
-                    mm_per_pixel = sensor_width_mm / width
-                    focal_length_mm = focal_length_pixels * mm_per_pixel
-                    print(f"センサーサイズから焦点距離を推定: {focal_length_mm:.1f}mm")
-                else:
-                    # デフォルト値を使用
-                    focal_length_mm = 50.0  # 標準レンズ
-                    print(f"デフォルト焦点距離を使用: {focal_length_mm}mm")
-            else:
-                # デフォルト値を使用
-                focal_length_mm = 50.0  # 標準レンズ
-                print(f"デフォルト焦点距離を使用: {focal_length_mm}mm")
-        
-        # 現在の並進ベクトルの長さを計算
+        target_distance = self._get_target_distance(camera_matrix, metadata_dict)
         current_distance = np.linalg.norm(t)
-        
-        # 適切な距離を設定（焦点距離の1-2倍程度）
-        target_distance = focal_length_mm * 1.5
-        
-        # 異常に大きな並進ベクトルの場合の特別処理
-        if current_distance > target_distance * 10:  # 異常に大きい場合
-            print(f"異常に大きな並進ベクトルを検出: {current_distance:.1f}mm → {target_distance:.1f}mm に調整")
-            # 方向を保持して距離を大幅に縮小
-            if current_distance > 0:
-                t_normalized = t * (target_distance / current_distance)
-            else:
-                t_normalized = np.array([target_distance, 0, 0])
-        elif current_distance > 0:
-            # 通常の正規化
-            t_normalized = t * (target_distance / current_distance)
-        else:
-            # デフォルトの距離を設定
-            t_normalized = np.array([target_distance, 0, 0])
-        
-        print(f"並進ベクトル正規化: {current_distance:.2f} → {np.linalg.norm(t_normalized):.2f} (目標距離: {target_distance:.1f}mm)")
-        return t_normalized
+        return t * (target_distance / current_distance) if current_distance > 0 else np.array([target_distance, 0, 0])
     
-    def normalize_all_poses(self, poses_dict: Dict[int, Tuple[np.ndarray, np.ndarray]],
+    def normalize_all_poses(self, poses_dict: Union[Dict[int, Tuple[np.ndarray, np.ndarray]], PoseTable],
                           camera_matrix: np.ndarray,
                           metadata_dict: Optional[Dict[int, Dict]] = None) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
         """全ての姿勢の並進ベクトルを正規化（控えめな調整）
         
         Args:
-            poses_dict: 姿勢辞書
+            poses_dict: 姿勢辞書（またはPoseTable）
             camera_matrix: カメラ行列
             metadata_dict: メタデータ辞書（焦点距離を取得するため）
             
         Returns:
             正規化された姿勢辞書
         """
-        print("全ての姿勢の正規化を開始（控えめな調整）")
+        logger.info("全ての姿勢の正規化を開始（控えめな調整）")
         
         if len(poses_dict) < 2:
             return poses_dict
         
-        # 実際の焦点距離（mm）を取得
-        focal_length_mm = None
-        if metadata_dict:
-            first_metadata = metadata_dict[list(metadata_dict.keys())[0]]
-            if 'focal_length' in first_metadata and first_metadata['focal_length'] is not None:
-                focal_length_mm = first_metadata['focal_length']
-                print(f"メタデータから焦点距離を取得: {focal_length_mm}mm")
-        
-        if focal_length_mm is None:
-            focal_length_mm = 50.0  # デフォルト値
-            print(f"デフォルト焦点距離を使用: {focal_length_mm}mm")
-        
-        # 目標距離を設定（焦点距離の1.5倍程度）
-        target_distance = focal_length_mm * 1.5
-        
-        # 現在のカメラ位置を分析
-        camera_positions = []
-        for img_idx, (R, t) in poses_dict.items():
-            camera_pos = -R.T @ t
-            camera_positions.append((img_idx, camera_pos))
-            print(f"カメラ {img_idx} の現在位置: {camera_pos}")
+        # 目標距離（焦点距離の1.5倍程度）
+        # シーンのスケールを変えないよう、焦点距離はメタデータの値のみを使い、なければ50mmとする
+        target_distance = self._resolve_focal_length_mm(camera_matrix, metadata_dict,
+                                                        use_sensor_estimate=False) * 1.5
+        
+        # 現在のカメラ位置を一括計算
+        pose_table = poses_dict if isinstance(poses_dict, PoseTable) else PoseTable.from_dict(poses_dict)
+        camera_positions = pose_table.centers()
         
         # カメラ位置の中心を計算（カメラ0を除く）
-        non_zero_positions = [pos for _, pos in camera_positions if np.linalg.norm(pos) > 0.1]
-        if len(non_zero_positions) > 0:
-            center = np.mean(non_zero_positions, axis=0)
+        non_zero = np.linalg.norm(camera_positions, axis=1) > 0.1
+        if np.any(non_zero):
+            center = camera_positions[non_zero].mean(axis=0)
         else:
             # 全てのカメラが原点付近の場合は、適切な中心を設定
             center = np.array([0.0, 0.0, 0.0])
         
-        print(f"カメラ位置の中心: {center}")
-        
-        # 各カメラを中心から適切な距離に配置（控えめな調整）
-        normalized_poses = {}
-        for img_idx, (R, t) in poses_dict.items():
-            current_pos = -R.T @ t
-            
-            # 中心からの方向ベクトルを計算
-            direction = current_pos - center
-            distance = np.linalg.norm(direction)
-            
-            if distance > 0:
-                # 現在の距離と目標距離の間で補間（控えめな調整）
-                current_distance = np.linalg.norm(current_pos - center)
-                if current_distance > target_distance * 3:  # 異常に遠い場合のみ調整
-                    # 方向を正規化して目標距離に調整
-                    normalized_direction = direction / distance
-                    new_pos = center + normalized_direction * target_distance
-                    print(f"カメラ {img_idx}: {current_pos} → {new_pos} (距離調整: {current_distance:.1f} → {target_distance:.1f}mm)")
-                elif current_distance < target_distance * 0.3:  # 異常に近い場合のみ調整
-                    # 方向を正規化して目標距離に調整
-                    normalized_direction = direction / distance
-                    new_pos = center + normalized_direction * target_distance
-                    print(f"カメラ {img_idx}: {current_pos} → {new_pos} (距離調整: {current_distance:.1f} → {target_distance:.1f}mm)")
-                else:
-                    # 適切な範囲内の場合はそのまま
-                    new_pos = current_pos
-                    print(f"カメラ {img_idx}: 位置を維持 {current_pos} (距離: {current_distance:.1f}mm)")
-            else:
-                # デフォルトの位置を設定（X軸方向）
-                new_pos = center + np.array([target_distance, 0, 0])
-                print(f"カメラ {img_idx}: デフォルト位置に配置 {new_pos}")
-            
-            # 新しい並進ベクトルを計算
-            new_t = -R @ new_pos
-            normalized_poses[img_idx] = (R, new_t.flatten())
+        logger.debug("カメラ位置の中心: %s", center)
+        
+        # 中心からの方向ベクトルと距離を計算
+        direction = camera_positions - center
+        distance = np.linalg.norm(direction, axis=1)
+        
+        # 異常に遠い・近い場合のみ目標距離に調整（控えめな調整）
+        has_direction = distance > 0
+        adjust = has_direction & ((distance > target_distance * 3) | (distance < target_distance * 0.3))
+        new_positions = camera_positions.copy()
+        new_positions[adjust] = center + direction[adjust] / distance[adjust, None] * target_distance
+        
+        # 中心と一致する場合はデフォルトの位置を設定（X軸方向）
+        new_positions[~has_direction] = center + np.array([target_distance, 0.0, 0.0])
+        
+        logger.info("距離調整: %d カメラ, デフォルト位置: %d カメラ, 維持: %d カメラ",
+                    int(np.sum(adjust)), int(np.sum(~has_direction)), int(np.sum(has_direction & ~adjust)))
+        
+        # 新しい並進ベクトルを一括計算
+        new_t = -np.einsum('kij,kj->ki', pose_table.R_stack, new_positions)
+        normalized_poses = PoseTable(pose_table.img_ids, pose_table.R_stack, new_t).poses_dict
         
-        print(f"姿勢正規化完了: {len(normalized_poses)} 画像")
+        logger.info("姿勢正規化完了: %d 画像", len(normalized_poses))
         return normalized_poses
\ No newline at end of file
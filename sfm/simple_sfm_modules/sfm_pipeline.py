@@ -11,30 +11,98 @@ import os
 import json
 from datetime import datetime
 import time
+import logging
+import itertools
+import gc
+from collections.abc import Mapping
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 from .image_loader import ImageLoader
 from .metadata_extractor import MetadataExtractor
-from .feature_extractor import FeatureExtractor
-from .feature_matcher import FeatureMatcher
+from .feature_extractor import FeatureExtractor, keypoints_to_xy
+from .feature_matcher import FeatureMatcher, matches_to_array
 from .pose_estimator import PoseEstimator
 from .bundle_adjuster import BundleAdjuster
 from .point_cloud_exporter import PointCloudExporter
 from .logger import SfMLogger
 
+logger = logging.getLogger(__name__)
+
+class _LazyImages(Mapping):
+    """画像インデックスから画像を必要になった時点で取得する読み取り専用の辞書"""
+    
+    def __init__(self, image_indices, get_image):
+        self._image_indices = dict.fromkeys(image_indices)
+        self._get_image = get_image
+    
+    def __getitem__(self, image_idx):
+        if image_idx not in self._image_indices:
+            raise KeyError(image_idx)
+        return self._get_image(image_idx)
+    
+    def __contains__(self, image_idx):
+        # Mapping既定の __contains__ は __getitem__ を呼ぶため、画像を読み込まずに判定する
+        return image_idx in self._image_indices
+    
+    def __iter__(self):
+        return iter(self._image_indices)
+    
+    def __len__(self):
+        return len(self._image_indices)
+
+
+# 追加マッチングでプロセスプールを使う最小ペア数（これ未満は起動コストの方が大きい）
+_PARALLEL_MATCH_MIN_TASKS = 8
+
+# 追加マッチング用ワーカープロセスのマッチャーとディスクリプタ
+_worker_matcher = None
+_worker_descriptors = None
+
+
+def _init_match_worker(matcher_type: str, ratio_threshold: float, min_matches: int,
+                       descriptors: Dict[int, np.ndarray]):
+    """ワーカープロセスの初期化
+    
+    ディスクリプタはワーカーごとに1回だけ受け渡し、タスクにはインデックスのみを載せる
+    """
+    global _worker_matcher, _worker_descriptors
+    _worker_matcher = FeatureMatcher(matcher_type, ratio_threshold, min_matches)
+    _worker_descriptors = descriptors
+
+
+def _match_pair_worker(task: Tuple[int, int]) -> tuple:
+    """ワーカープロセスで1ペアのマッチングを実行
+    
+    Args:
+        task: (画像インデックス1, 画像インデックス2)
+        
+    Returns:
+        (画像インデックス1, 画像インデックス2, [(queryIdx, trainIdx, distance), ...])
+    """
+    idx1, idx2 = task
+    matches = _worker_matcher.match_features(_worker_descriptors[idx1], _worker_descriptors[idx2])
+    # cv2.DMatchはpickleできないためタプルで返す
+    return idx1, idx2, [(m.queryIdx, m.trainIdx, m.distance) for m in matches]
+
 
 class SFMPipeline:
     """SfMパイプラインクラス"""
     
     def __init__(self, output_dir: str = "output/sfm_pipeline", 
-                 log_dir: str = "logs", project_name: str = "sfm_pipeline"):
+                 log_dir: str = "logs", project_name: str = "sfm_pipeline",
+                 generate_additional_matches: bool = False):
         """初期化
         
         Args:
             output_dir: 出力ディレクトリ
             log_dir: ログディレクトリ
             project_name: プロジェクト名
+            generate_additional_matches: 三角測量時に未マッチングの姿勢推定済みペアを追加でマッチングするか
+                （有効にすると三角測量に使うペアが増え、再構成結果が変わる）
         """
         self.output_dir = Path(output_dir)
+        self.generate_additional_matches = generate_additional_matches
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # SfMLoggerを初期化
@@ -52,14 +120,23 @@ class SFMPipeline:
         # データを保持
         self.images = {}
         self.image_paths = {}  # 画像パスを保持
+        # 解放済みの画像をパスから読み直す際のキャッシュ（直近の数枚のみ保持）
+        self._load_image_cached = lru_cache(maxsize=8)(self._reload_image)
         self.metadata_dict = {}
+        self.camera_matrix = None  # metadata_dict から推定したカメラ行列（メタデータ更新時に破棄）
         self.keypoints_dict = {}
+        self.keypoints_xy = {}  # 画像ごとの特徴点座標 (N, 2) float32（抽出時に一度だけ作成）
         self.descriptors_dict = {}
         self.matches_dict = {}
+        self.match_indices = {}  # ペアごとの (queryIdx配列, trainIdx配列)（int32、DMatchの展開を1回に抑える）
         self.poses_dict = {}
-        self.points_3d = np.array([])
+        self.points_3d = np.empty((0, 3), dtype=np.float32)
         self.point_colors = None
         self.image_points = {}
+        # 観測データ（SoA形式: 観測kはカメラ obs_cam_ids[k] が3D点 obs_point_ids[k] を obs_uv[k] で観測）
+        self.obs_cam_ids = np.empty(0, dtype=np.int32)
+        self.obs_point_ids = np.empty(0, dtype=np.int32)
+        self.obs_uv = np.empty((0, 2), dtype=np.float32)
         
         # パイプラインの実行結果
         self.pipeline_results = {}
@@ -71,12 +148,14 @@ class SFMPipeline:
             "project_name": project_name
         })
     
-    def load_images(self, image_dir: str, max_images: Optional[int] = None) -> Dict[int, np.ndarray]:
+    def load_images(self, image_dir: str, max_images: Optional[int] = None,
+                    workers: Optional[int] = None) -> Dict[int, np.ndarray]:
         """画像を読み込み
         
         Args:
             image_dir: 画像ディレクトリ
             max_images: 最大画像数（オプション）
+            workers: 読み込みスレッド数（オプション）
             
         Returns:
             画像辞書
@@ -85,23 +164,17 @@ class SFMPipeline:
         print(f"画像読み込みを開始: {image_dir}")
         
         # ImageLoaderのload_images_from_directoryは辞書を返す
-        images_dict, paths_dict = self.image_loader.load_images_from_directory(image_dir)
-        
-        # max_imagesが指定されている場合は制限
-        if max_images is not None and len(images_dict) > max_images:
-            limited_images = {}
-            limited_paths = {}
-            for i in range(max_images):
-                if i in images_dict:
-                    limited_images[i] = images_dict[i]
-                    limited_paths[i] = paths_dict[i]
-            images_dict = limited_images
-            paths_dict = limited_paths
+        # max_imagesはデコード前にパスリストへ適用される
+        images_dict, paths_dict = self.image_loader.load_images_from_directory(
+            image_dir, max_images=max_images, workers=workers
+        )
+        if max_images is not None:
             print(f"画像数を制限: {max_images} 画像")
         
         # データを保持
         self.images = images_dict
         self.image_paths = paths_dict
+        self._load_image_cached.cache_clear()
         
         processing_time = time.time() - start_time
         print(f"画像読み込み完了: {len(self.images)} 画像")
@@ -112,8 +185,11 @@ class SFMPipeline:
             "total_images": len(self.images),
             "max_images": max_images,
             "processing_time": processing_time,
-            "image_paths": list(paths_dict.values())
+            "num_paths": len(paths_dict),
+            "first_3_paths": list(paths_dict.values())[:3]
         })
+        # 全パスの一覧は別ファイルに一度だけ記録
+        self.logger.log_paths_manifest(paths_dict)
         
         return self.images
     
@@ -123,17 +199,26 @@ class SFMPipeline:
         Returns:
             メタデータ辞書
         """
-        if not self.images or not self.image_paths:
+        if not self.image_paths:
             print("画像が読み込まれていません")
             return {}
         
         start_time = time.time()
         print("メタデータ抽出を開始")
         
-        self.metadata_dict = {}
-        for image_idx, image_path in self.image_paths.items():
-            metadata = self.metadata_extractor.extract_metadata_from_image(image_path)
-            self.metadata_dict[image_idx] = metadata
+        # 画像ごとのEXIF解析は独立しているためスレッドで並列実行
+        results = {}
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = {
+                executor.submit(self.metadata_extractor.extract_metadata_from_image, image_path): image_idx
+                for image_idx, image_path in self.image_paths.items()
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        
+        # 完了順ではなく画像の順序で保持（先頭画像のメタデータを基準に使うため）
+        self.metadata_dict = {image_idx: results[image_idx] for image_idx in self.image_paths}
+        self.camera_matrix = None
         
         # メタデータを保存
         metadata_file = self.output_dir / "metadata.json"
@@ -178,6 +263,8 @@ class SFMPipeline:
         self.keypoints_dict, self.descriptors_dict = self.feature_extractor.extract_features_batch(
             self.images, str(self.output_dir / "keypoints")
         )
+        # 下流の処理で KeyPoint.pt を参照しないよう、抽出時に作成した座標配列を保持
+        self.keypoints_xy = self.feature_extractor.keypoints_xy_dict
         
         # 特徴点データを保存
         features_dir = self.output_dir / "features"
@@ -204,13 +291,15 @@ class SFMPipeline:
     
     def match_features(self, matcher_type: str = 'FLANN', 
                       ratio_threshold: float = 0.7, 
-                      min_matches: int = 10) -> Dict[Tuple[int, int], List[cv2.DMatch]]:
+                      min_matches: int = 10,
+                      visualize: bool = False) -> Dict[Tuple[int, int], List[cv2.DMatch]]:
         """特徴点をマッチング
         
         Args:
             matcher_type: マッチャーの種類
             ratio_threshold: Lowe's ratio testの閾値
             min_matches: 最小マッチング数
+            visualize: マッチング可視化画像を保存するかどうか
             
         Returns:
             マッチング結果辞書
@@ -227,13 +316,15 @@ class SFMPipeline:
         
         # 全ペアマッチング
         self.matches_dict = self.feature_matcher.match_all_pairs(self.descriptors_dict)
+        self._index_matches(self.matches_dict)
         
         # マッチング結果を保存
         matches_dir = self.output_dir / "matches"
         self.feature_matcher.save_matches(self.matches_dict, str(matches_dir))
         
-        # マッチング可視化
-        self._visualize_matches()
+        # マッチング可視化（デバッグ用、既定では無効）
+        if visualize:
+            self._visualize_matches()
         
         processing_time = time.time() - start_time
         print(f"特徴点マッチング完了: {len(self.matches_dict)} ペア")
@@ -267,11 +358,15 @@ class SFMPipeline:
         print("姿勢推定を開始")
         
         # カメラ行列を推定
-        camera_matrix = self.pose_estimator.estimate_camera_matrix_from_metadata(self.metadata_dict)
+        camera_matrix = self._get_camera_matrix()
+        
+        # 並進スケール（焦点距離・目標距離）を一度だけ決定
+        self.pose_estimator.configure(camera_matrix, self.metadata_dict)
         
         # 初期姿勢を推定
         self.poses_dict = self.pose_estimator.estimate_initial_poses(
-            self.keypoints_dict, self.descriptors_dict, self.matches_dict, camera_matrix, self.metadata_dict
+            self.keypoints_dict, self.descriptors_dict, self.matches_dict, camera_matrix, self.metadata_dict,
+            keypoints_xy_dict=self.keypoints_xy
         )
         
         # 初期姿勢推定後の正規化（3D点生成前に実行）
@@ -293,7 +388,8 @@ class SFMPipeline:
             "camera_matrix_shape": camera_matrix.shape if camera_matrix is not None else None,
             "processing_time": processing_time,
             "poses_dir": str(poses_dir),
-            "estimated_cameras": list(self.poses_dict.keys())
+            "num_estimated_cameras": len(self.poses_dict),
+            "first_3_estimated_cameras": list(self.poses_dict.keys())[:3]
         })
         
         return self.poses_dict
@@ -310,114 +406,132 @@ class SFMPipeline:
         
         start_time = time.time()
         print("三角測量を開始")
-        print(f"利用可能な姿勢: {list(self.poses_dict.keys())}")
-        print(f"利用可能なマッチング: {list(self.matches_dict.keys())}")
+        logger.debug("利用可能な姿勢: %s", self.poses_dict.keys())
+        logger.debug("利用可能なマッチング: %s", self.matches_dict.keys())
         
         # カメラ行列を推定
-        camera_matrix = self.pose_estimator.estimate_camera_matrix_from_metadata(self.metadata_dict)
+        camera_matrix = self._get_camera_matrix()
         
         # 3D点を計算
-        points_3d_list = []
-        image_points_dict = {}  # 3D点と画像点の対応関係を保存
-        
-        # 各カメラの画像点を初期化
-        for camera_idx in self.poses_dict.keys():
-            image_points_dict[camera_idx] = []
+        # 3D点と画像点の対応関係（カメラごとに3D点IDで引けるNaN埋めの配列、3D点数の上限で一度だけ確保）
+        self.image_points = {}
+        # 観測データのペアごとのブロック（最後に一度だけ連結）
+        obs_cam_blocks, obs_point_blocks, obs_uv_blocks = [], [], []
         
         point_id = 0  # 3D点のID
         
-        # より多くのマッチングペアを処理するために、追加のマッチングを生成
-        additional_matches = self._generate_additional_matches()
-        all_matches = {**self.matches_dict, **additional_matches}
+        # より多くのマッチングペアを処理するために、追加のマッチングを生成（有効な場合のみ）
+        additional_matches = self._generate_additional_matches() if self.generate_additional_matches else {}
+        # 追加マッチングは既存ペアと重複しないため、辞書を合成せず2つを続けて走査する
+        def iter_all_matches():
+            return itertools.chain(self.matches_dict.items(), additional_matches.items())
         
         print(f"元のマッチング数: {len(self.matches_dict)}")
         print(f"追加マッチング数: {len(additional_matches)}")
-        print(f"総マッチング数: {len(all_matches)}")
+        print(f"総マッチング数: {len(self.matches_dict) + len(additional_matches)}")
+        
+        # 1パス目: 三角測量対象ペアのマッチング数の合計（3D点数の上限）で出力バッファを一度だけ確保
+        max_points = sum(
+            len(matches) for (idx1, idx2), matches in iter_all_matches()
+            if idx1 in self.poses_dict and idx2 in self.poses_dict
+        )
+        points_3d_buffer = np.empty((max_points, 3), dtype=np.float32)
+        
+        # 投影行列はカメラごとに一度だけ計算し、ペア間で共有する
+        projection_matrices = self.pose_estimator.projection_matrices(self.poses_dict, camera_matrix)
         
-        for (idx1, idx2), matches in all_matches.items():
-            print(f"マッチングペア ({idx1}, {idx2}): {len(matches)} マッチング")
+        # ペアごとの結果は集計だけ行い、ループ後にまとめて表示する
+        num_triangulated_pairs = 0
+        num_skipped_pairs = 0
+        
+        for (idx1, idx2), matches in iter_all_matches():
+            logger.debug("マッチングペア (%d, %d): %d マッチング", idx1, idx2, len(matches))
             
             if idx1 in self.poses_dict and idx2 in self.poses_dict:
-                print(f"  両方の姿勢が利用可能")
-                
-                # 対応点の座標を取得
-                pts1, pts2 = self.feature_matcher.get_matched_points(
-                    self.keypoints_dict[idx1], self.keypoints_dict[idx2], matches
-                )
+                # 対応点の座標を (2, N) のSoA形式で取得（座標配列をインデックス配列で引くだけ）
+                pts1, pts2 = self._get_matched_points_soa(idx1, idx2, matches)
                 
-                print(f"  対応点: {len(pts1)} 点")
+                logger.debug("  対応点: %d 点", pts1.shape[-1])
                 
-                if len(pts1) > 0 and len(pts2) > 0:
+                if pts1.size > 0 and pts2.size > 0:
+                    # 画像座標はfloat32で三角測量に渡す（既にfloat32ならコピーしない）
+                    pts1 = pts1.astype(np.float32, copy=False)
+                    pts2 = pts2.astype(np.float32, copy=False)
+                    
                     # 姿勢を取得
                     R1, t1 = self.poses_dict[idx1]
                     R2, t2 = self.poses_dict[idx2]
                     
-                    print(f"  姿勢1: R shape={R1.shape}, t shape={t1.shape}")
-                    print(f"  姿勢2: R shape={R2.shape}, t shape={t2.shape}")
-                    
-                    # 三角測量
-                    points_3d = self.pose_estimator.triangulate_points(
-                        pts1, pts2, R1, t1, R2, t2, camera_matrix
+                    # 三角測量と緩いCheirality制約の判定を1回の呼び出しで実行
+                    # （有効な点だけが詰められて返るため、そのままバッファに書き込める）
+                    valid_points_3d, valid_mask = self.pose_estimator.triangulate_with_cheirality(
+                        pts1, pts2, R1, t1, R2, t2, camera_matrix,
+                        P1=projection_matrices[idx1], P2=projection_matrices[idx2]
                     )
                     
-                    if len(points_3d) > 0:
-                        # Cheirality制約をチェック
-                        # valid_indices = self.pose_estimator.check_cheirality(points_3d, R1, t1)
-                        valid_indices = self.pose_estimator.check_cheirality_relaxed(points_3d, R1, t1)
+                    if len(valid_mask) > 0:
+                        valid_indices = np.flatnonzero(valid_mask)
 
                         if len(valid_indices) > 0:
-                            valid_points_3d = points_3d[valid_indices]
-                            points_3d_list.append(valid_points_3d)
+                            # 3D点と画像点の対応関係を保存（3D点IDは point_id から連番、1ペア1回の代入）
+                            end_id = point_id + len(valid_indices)
+                            points_3d_buffer[point_id:end_id] = valid_points_3d
+                            self._get_image_points_array(idx1, max_points)[point_id:end_id] = pts1[:, valid_indices].T
+                            self._get_image_points_array(idx2, max_points)[point_id:end_id] = pts2[:, valid_indices].T
                             
-                            # 画像点の対応関係を保存
-                            for i, valid_idx in enumerate(valid_indices):
-                                # 各カメラの画像点を初期化（必要に応じて拡張）
-                                while len(image_points_dict[idx1]) <= point_id + i:
-                                    image_points_dict[idx1].append(None)
-                                while len(image_points_dict[idx2]) <= point_id + i:
-                                    image_points_dict[idx2].append(None)
-                                
-                                # 有効な画像点を保存
-                                image_points_dict[idx1][point_id + i] = pts1[valid_idx]
-                                image_points_dict[idx2][point_id + i] = pts2[valid_idx]
+                            # 観測データ（2カメラ分）をSoAのブロックとして追加
+                            num_valid = len(valid_indices)
+                            ids = np.arange(point_id, end_id, dtype=np.int32)
+                            obs_cam_blocks.append(np.repeat(np.array([idx1, idx2], dtype=np.int32), num_valid))
+                            obs_point_blocks.append(np.concatenate([ids, ids]))
+                            obs_uv_blocks.append(np.concatenate([pts1[:, valid_indices].T, pts2[:, valid_indices].T]))
                             
                             point_id += len(valid_indices)
-                            print(f"  有効な3D点: {len(valid_indices)} 点")
+                            num_triangulated_pairs += 1
+                            logger.debug("  有効な3D点: %d 点", len(valid_indices))
                         else:
-                            print(f"  Cheirality制約で全ての点が除外されました")
+                            num_skipped_pairs += 1
+                            logger.debug("  Cheirality制約で全ての点が除外されました")
                     else:
-                        print(f"  三角測量で3D点が生成されませんでした")
+                        num_skipped_pairs += 1
+                        logger.debug("  三角測量で3D点が生成されませんでした")
                 else:
-                    print(f"  対応点が不足しています")
+                    num_skipped_pairs += 1
+                    logger.debug("  対応点が不足しています")
             else:
-                print(f"  姿勢が不足: idx1={idx1 in self.poses_dict}, idx2={idx2 in self.poses_dict}")
-        
-        if points_3d_list:
-            self.points_3d = np.vstack(points_3d_list)
-            # 画像点の対応関係をNumPy配列に変換
-            self.image_points = {}
-            for camera_idx, points_list in image_points_dict.items():
-                if points_list:
-                    # NoneをNaNに変換してNumPy配列に変換
-                    points_array = []
-                    for point in points_list:
-                        if point is None:
-                            points_array.append([np.nan, np.nan])
-                        else:
-                            points_array.append(point)
-                    self.image_points[camera_idx] = np.array(points_array)
+                num_skipped_pairs += 1
+                logger.debug("  姿勢が不足: idx1=%s, idx2=%s", idx1 in self.poses_dict, idx2 in self.poses_dict)
+        
+        print(f"三角測量: {num_triangulated_pairs} ペアから {point_id} 点（スキップ {num_skipped_pairs} ペア）")
+        
+        if point_id > 0:
+            # 上限サイズのバッファを残さないよう、実際の点数分だけコピーして保持
+            self.points_3d = points_3d_buffer[:point_id].copy()
+            # 画像点の対応関係を全3D点数の長さにコピーして揃える（上限サイズの配列は残さない）
+            total_points = point_id
+            for camera_idx in self.image_points:
+                self.image_points[camera_idx] = self.image_points[camera_idx][:total_points].copy()
+            
+            self.obs_cam_ids = np.concatenate(obs_cam_blocks)
+            self.obs_point_ids = np.concatenate(obs_point_blocks)
+            self.obs_uv = np.concatenate(obs_uv_blocks).astype(np.float32, copy=False)
             
             print(f"三角測量完了: {len(self.points_3d)} 3D点")
             print(f"画像点対応関係: {len(self.image_points)} カメラ")
             
-            # デバッグ情報を追加
-            for camera_idx, points_array in self.image_points.items():
-                valid_points = np.sum(~np.isnan(points_array[:, 0]))
-                print(f"  カメラ {camera_idx}: {len(points_array)} 点中 {valid_points} 点が有効")
+            # デバッグ情報を追加（DEBUGレベルのときだけ集計する）
+            if logger.isEnabledFor(logging.DEBUG):
+                for camera_idx, points_array in self.image_points.items():
+                    valid_points = np.sum(~np.isnan(points_array[:, 0]))
+                    logger.debug("  カメラ %d: %d 点中 %d 点が有効", camera_idx, len(points_array), valid_points)
         else:
-            self.points_3d = np.array([])
+            self.points_3d = np.empty((0, 3), dtype=np.float32)
             self.image_points = {}
+            self.obs_cam_ids = np.empty(0, dtype=np.int32)
+            self.obs_point_ids = np.empty(0, dtype=np.int32)
+            self.obs_uv = np.empty((0, 2), dtype=np.float32)
             print("三角測量: 有効な3D点が生成されませんでした")
+        del points_3d_buffer
         
         processing_time = time.time() - start_time
         
@@ -430,6 +544,47 @@ class SFMPipeline:
         
         return self.points_3d
     
+    def _get_camera_matrix(self) -> np.ndarray:
+        """カメラ行列を取得（メタデータから一度だけ推定してキャッシュ）"""
+        if self.camera_matrix is None:
+            self.camera_matrix = self.pose_estimator.estimate_camera_matrix_from_metadata(self.metadata_dict)
+        return self.camera_matrix
+    
+    def _index_matches(self, matches_dict: Dict[Tuple[int, int], List[cv2.DMatch]]):
+        """マッチング結果のインデックス配列を作成して self.match_indices に登録"""
+        for pair, matches in matches_dict.items():
+            match_arr = matches_to_array(matches)
+            self.match_indices[pair] = (match_arr['q'].astype(np.int32), match_arr['t'].astype(np.int32))
+    
+    def _get_matched_points_soa(self, idx1: int, idx2: int,
+                                matches: List[cv2.DMatch]) -> Tuple[np.ndarray, np.ndarray]:
+        """ペアの対応点座標を (2, N) のC連続配列で取得（インデックス配列と座標配列はキャッシュを使う）"""
+        indices = self.match_indices.get((idx1, idx2))
+        if indices is None or len(indices[0]) != len(matches):
+            self._index_matches({(idx1, idx2): matches})
+            indices = self.match_indices[(idx1, idx2)]
+        query_idx, train_idx = indices
+        if len(query_idx) == 0:
+            return np.array([]), np.array([])
+        
+        keypoints_xy_dict = self.keypoints_xy
+        for idx in (idx1, idx2):
+            if idx not in keypoints_xy_dict:
+                keypoints_xy_dict[idx] = keypoints_to_xy(self.keypoints_dict[idx])
+        
+        # (2, N) のビューから列方向に取り出すと結果はC連続の (2, M) になる
+        pts1 = np.take(keypoints_xy_dict[idx1].T, query_idx, axis=1)
+        pts2 = np.take(keypoints_xy_dict[idx2].T, train_idx, axis=1)
+        return pts1, pts2
+    
+    def _get_image_points_array(self, camera_idx: int, capacity: int) -> np.ndarray:
+        """カメラの画像点配列を取得（初回のみ capacity 行をNaN埋めで確保）"""
+        points_2d = self.image_points.get(camera_idx)
+        if points_2d is None:
+            points_2d = np.full((capacity, 2), np.nan, dtype=np.float32)
+            self.image_points[camera_idx] = points_2d
+        return points_2d
+    
     def run_bundle_adjustment(self) -> Tuple[np.ndarray, Dict[int, Tuple[np.ndarray, np.ndarray]]]:
         """バンドル調整を実行
         
@@ -444,14 +599,24 @@ class SFMPipeline:
         print("バンドル調整を開始")
         
         try:
-            # バンドル調整を実行（image_pointsを渡す）
+            # バンドル調整を実行（image_points とSoA形式の観測データを渡す）
+            observations_soa = None
+            if len(self.obs_cam_ids) > 0:
+                observations_soa = (self.obs_cam_ids, self.obs_point_ids, self.obs_uv)
+            # 問題サイズ（パラメータ数）で線形ソルバーを選ぶ
+            linear_solver = self.bundle_adjuster.select_linear_solver(len(self.points_3d), len(self.poses_dict))
+            print(f"バンドル調整の問題サイズ: {len(self.poses_dict)} カメラ, {len(self.points_3d)} 点, "
+                  f"{len(self.obs_cam_ids)} 観測 -> {linear_solver}")
             optimized_points_3d, optimized_poses_dict = self.bundle_adjuster.run_bundle_adjustment(
                 self.keypoints_dict, self.matches_dict, self.poses_dict, 
-                self.points_3d, self.metadata_dict, self.image_points
+                self.points_3d, self.metadata_dict, self.image_points,
+                observations_soa=observations_soa,
+                keypoints_xy_dict=self.keypoints_xy,
+                linear_solver=linear_solver
             )
             
             # 結果を更新
-            self.points_3d = optimized_points_3d
+            self.points_3d = np.asarray(optimized_points_3d, dtype=np.float32)
             self.poses_dict = optimized_poses_dict
             
             # 結果を保存
@@ -494,8 +659,10 @@ class SFMPipeline:
         """色付き点群を作成"""
         print("色付き点群を作成中...")
         if self.points_3d is not None and len(self.points_3d) > 0:
+            # 画像は1枚ずつ必要になった時点で取得する（解放済みならパスから読み直す）
+            images = _LazyImages(self.image_paths, self._get_image)
             self.point_colors = self.point_cloud_exporter.create_colored_point_cloud(
-                self.points_3d, self.images, self.poses_dict, self.image_points
+                self.points_3d, images, self.poses_dict, self.image_points
             )
             print("色付き点群作成完了")
             return self.point_colors
@@ -510,19 +677,35 @@ class SFMPipeline:
         # メタデータを準備
         metadata = {
             "timestamp": datetime.now().isoformat(),
-            "num_images": len(self.images),
+            "num_images": len(self.image_paths),
             "num_points_3d": len(self.points_3d) if self.points_3d is not None else 0,
             "num_cameras": len(self.poses_dict),
             "num_matches": len(self.matches_dict)
         }
         
-        # カメラ姿勢情報を準備
+        # カメラ姿勢情報を (N, 3, 3) / (N, 3) の配列にまとめ、バイナリで保存
+        camera_ids = list(self.poses_dict.keys())
+        R_stack = np.array([self.poses_dict[idx][0] for idx in camera_ids], dtype=np.float64).reshape(-1, 3, 3)
+        t_stack = np.array([np.reshape(self.poses_dict[idx][1], 3) for idx in camera_ids], dtype=np.float64).reshape(-1, 3)
+        K_stack = np.full((len(camera_ids), 3, 3), np.nan)
+        has_K = np.zeros(len(camera_ids), dtype=bool)
+        for i, idx in enumerate(camera_ids):
+            K = self.metadata_dict.get(idx, {}).get('K')
+            if K is not None:
+                K_stack[i] = K
+                has_K[i] = True
+        
+        cameras_npz_file = self.output_dir / f"{base_filename}_cameras.npz"
+        np.savez(cameras_npz_file, ids=np.array(camera_ids, dtype=np.int32),
+                 R=R_stack, t=t_stack, K=K_stack, has_K=has_K)
+        
+        # JSON用にはスタックした配列のビューをそのまま渡す（リスト化はJSON出力側で行う）
         camera_poses_export = {}
-        for img_name, pose in self.poses_dict.items():
-            camera_poses_export[img_name] = {
-                "R": pose[0].tolist(),
-                "t": pose[1].tolist(),
-                "K": self.metadata_dict[img_name]['K'].tolist() if 'K' in self.metadata_dict[img_name] else None
+        for i, idx in enumerate(camera_ids):
+            camera_poses_export[idx] = {
+                "R": R_stack[i],
+                "t": t_stack[i],
+                "K": K_stack[i] if has_K[i] else None
             }
         
         # 点群データを出力
@@ -534,19 +717,20 @@ class SFMPipeline:
             base_filename=base_filename
         )
         
-        # パイプライン結果を保存
-        pipeline_file = self.output_dir / f"{base_filename}_pipeline.json"
+        output_files['cameras_npz'] = str(cameras_npz_file)
+        
+        # パイプライン結果を保存（orjsonが利用可能ならNumPy配列をそのままシリアライズ）
         self.pipeline_results = {
             "metadata": metadata,
             "camera_poses": camera_poses_export,
             "output_files": output_files
         }
         
-        with open(pipeline_file, 'w') as f:
-            json.dump(self.pipeline_results, f, indent=2, default=str)
+        pipeline_file = self.point_cloud_exporter.export_json(
+            self.pipeline_results, f"{base_filename}_pipeline.json", "パイプライン結果"
+        )
         
         output_files['pipeline'] = str(pipeline_file)
-        print(f"パイプライン結果を保存しました: {pipeline_file}")
         
         return output_files
     
@@ -585,15 +769,19 @@ class SFMPipeline:
             
             # 3. 特徴点抽出
             self.extract_features(detector_type, max_features)
+            # 以降の処理では画像そのものは色付けにしか使わないため解放する
+            self.release_images()
             
             # 4. 特徴点マッチング
-            self.match_features(matcher_type, ratio_threshold, min_matches)
+            self.match_features(matcher_type, ratio_threshold, min_matches, visualize=False)
             
             # 5. 姿勢推定
             self.estimate_poses()
             
             # 6. 三角測量
             self.triangulate_points()
+            # ディスクリプタはマッチング（追加マッチングを含む）にしか使わないため解放する
+            self.release_descriptors()
             
             # 7. バンドル調整
             # self.run_bundle_adjustment()
@@ -609,7 +797,7 @@ class SFMPipeline:
             
             # 結果をまとめる
             results = {
-                'images': len(self.images),
+                'images': len(self.image_paths),
                 'keypoints': {idx: len(kpts) for idx, kpts in self.keypoints_dict.items()},
                 'matches': len(self.matches_dict),
                 'poses': len(self.poses_dict),
@@ -655,25 +843,65 @@ class SFMPipeline:
             # ログのクリーンアップ
             self.logger.cleanup()
     
-    def _visualize_matches(self):
-        """マッチング結果を可視化"""
-        if not self.images or not self.matches_dict:
+    def release_images(self):
+        """読み込んだ画像を解放（画像パスは保持し、必要な場合は _get_image で読み直す）"""
+        self.images = {}
+    
+    def release_descriptors(self):
+        """ディスクリプタを解放（再度マッチングする場合は load_saved_data で読み直す）"""
+        self.descriptors_dict = {}
+        gc.collect()
+    
+    def _get_image(self, image_idx: int) -> Optional[np.ndarray]:
+        """画像を取得（メモリ上になければ画像パスから読み直す）"""
+        if image_idx in self.images:
+            return self.images[image_idx]
+        return self._load_image_cached(image_idx)
+    
+    def _reload_image(self, image_idx: int) -> Optional[np.ndarray]:
+        """画像パスから画像を読み込み"""
+        image_path = self.image_paths.get(image_idx)
+        if image_path is None:
+            return None
+        return self.image_loader.load_image(image_path)
+    
+    def _visualize_matches(self, max_pairs: int = 20):
+        """マッチング結果を可視化
+        
+        Args:
+            max_pairs: 可視化するペア数の上限（マッチング数の多い順）
+        """
+        if not self.image_paths or not self.matches_dict:
             return
         
         matches_vis_dir = self.output_dir / "matches_visualization"
         matches_vis_dir.mkdir(exist_ok=True)
         
-        for (idx1, idx2), matches in self.matches_dict.items():
-            if idx1 in self.images and idx2 in self.images:
-                image1 = self.images[idx1]
-                image2 = self.images[idx2]
-                keypoints1 = self.keypoints_dict[idx1]
-                keypoints2 = self.keypoints_dict[idx2]
-                
+        # マッチング数の多いペアを上位max_pairs件だけ可視化
+        pairs = [(pair, matches) for pair, matches in self.matches_dict.items()
+                 if pair[0] in self.image_paths and pair[1] in self.image_paths]
+        pairs.sort(key=lambda item: len(item[1]), reverse=True)
+        
+        # 描画とJPEGエンコードはGILを解放するためスレッドで並列に書き出す
+        with ThreadPoolExecutor() as executor:
+            futures = {}
+            for (idx1, idx2), matches in pairs[:max_pairs]:
                 output_path = matches_vis_dir / f"matches_{idx1}_{idx2}.jpg"
-                self.feature_matcher.visualize_matches(
-                    image1, image2, keypoints1, keypoints2, matches, str(output_path)
+                future = executor.submit(
+                    self.feature_matcher.visualize_matches,
+                    self._get_image(idx1), self._get_image(idx2),
+                    self.keypoints_dict[idx1], self.keypoints_dict[idx2],
+                    matches, str(output_path)
                 )
+                futures[future] = (idx1, idx2)
+            
+            # 可視化の失敗でパイプラインは止めないが、例外は握りつぶさずに記録する
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    idx1, idx2 = futures[future]
+                    logger.warning("マッチング可視化エラー (%s, %s): %s", idx1, idx2, e)
     
     def load_saved_data(self):
         """保存されたデータを読み込み"""
@@ -681,16 +909,20 @@ class SFMPipeline:
         metadata_file = self.output_dir / "metadata.json"
         if metadata_file.exists():
             self.metadata_dict = self.metadata_extractor.load_metadata_json(str(metadata_file))
+            self.camera_matrix = None
         
         # 特徴点を読み込み
         features_dir = self.output_dir / "features"
         if features_dir.exists():
             self.keypoints_dict, self.descriptors_dict = self.feature_extractor.load_features(str(features_dir))
+            self.keypoints_xy = self.feature_extractor.keypoints_xy_dict
         
         # マッチング結果を読み込み
         matches_dir = self.output_dir / "matches"
         if matches_dir.exists():
             self.matches_dict = self.feature_matcher.load_matches(str(matches_dir))
+            self.match_indices = {}
+            self._index_matches(self.matches_dict)
         
         # 姿勢を読み込み
         poses_dir = self.output_dir / "poses"
@@ -701,6 +933,8 @@ class SFMPipeline:
         bundle_dir = self.output_dir / "bundle_adjustment"
         if bundle_dir.exists():
             self.points_3d, self.poses_dict = self.bundle_adjuster.load_bundle_adjustment_results(str(bundle_dir))
+            if len(self.points_3d) > 0:
+                self.points_3d = self.points_3d.astype(np.float32, copy=False)
         
         print("保存されたデータを読み込み完了")
 
@@ -712,38 +946,67 @@ class SFMPipeline:
         """
         additional_matches = {}
         
-        # 利用可能なカメラの組み合わせを生成
+        # 利用可能なカメラの組み合わせのうち、マッチングが未作成のペアを列挙
+        # 既存ペアは順序を問わない集合にしておき、1回の所属判定で除外する
         camera_indices = list(self.poses_dict.keys())
-        
-        for i in range(len(camera_indices)):
-            for j in range(i + 1, len(camera_indices)):
-                idx1, idx2 = camera_indices[i], camera_indices[j]
-                
-                # 既にマッチングが存在する場合はスキップ
-                if (idx1, idx2) in self.matches_dict or (idx2, idx1) in self.matches_dict:
-                    continue
-                
-                # 新しいマッチングを生成
+        existing_pairs = {frozenset(pair) for pair in self.matches_dict}
+        tasks = [
+            (idx1, idx2)
+            for idx1, idx2 in itertools.combinations(camera_indices, 2)
+            if frozenset((idx1, idx2)) not in existing_pairs
+        ]
+        
+        if not tasks:
+            return additional_matches
+        
+        # より緩い閾値（ratio=0.8）と少ない最小マッチング数（5）を使用
+        results = {}
+        if len(tasks) < _PARALLEL_MATCH_MIN_TASKS:
+            # ペアが少ない場合はプロセス起動とディスクリプタ転送のコストが上回るため直接実行
+            matcher = FeatureMatcher(self.feature_matcher.matcher_type, 0.8, 5)
+            for idx1, idx2 in tasks:
                 try:
-                    matches = self.feature_matcher.match_features(
-                        self.descriptors_dict[idx1], 
-                        self.descriptors_dict[idx2],
-                        ratio_threshold=0.8,  # より緩い閾値
-                        min_matches=5  # より少ない最小マッチング数
-                    )
-                    
-                    if len(matches) >= 5:
-                        additional_matches[(idx1, idx2)] = matches
-                        print(f"追加マッチング生成: ({idx1}, {idx2}) -> {len(matches)} マッチング")
-                        
+                    matches = matcher.match_features(self.descriptors_dict[idx1], self.descriptors_dict[idx2])
                 except Exception as e:
-                    print(f"追加マッチング生成エラー ({idx1}, {idx2}): {e}")
+                    logger.warning("追加マッチング生成エラー (%s, %s): %s", idx1, idx2, e)
                     continue
+                results[(idx1, idx2)] = [(m.queryIdx, m.trainIdx, m.distance) for m in matches]
+        else:
+            # FLANNはGILを完全には解放しないため、プロセスで並列にマッチング
+            # ディスクリプタはイニシャライザで各ワーカーへ1回だけ送る
+            used_indices = {idx for pair in tasks for idx in pair}
+            descriptors = {idx: self.descriptors_dict[idx] for idx in used_indices}
+            with ProcessPoolExecutor(initializer=_init_match_worker,
+                                     initargs=(self.feature_matcher.matcher_type, 0.8, 5, descriptors)) as executor:
+                futures = {executor.submit(_match_pair_worker, task): task for task in tasks}
+                for future in as_completed(futures):
+                    idx1, idx2 = futures[future]
+                    try:
+                        _, _, raw_matches = future.result()
+                    except Exception as e:
+                        logger.warning("追加マッチング生成エラー (%s, %s): %s", idx1, idx2, e)
+                        continue
+                    results[(idx1, idx2)] = raw_matches
+        
+        # ペアの順序で DMatch を復元
+        for idx1, idx2 in tasks:
+            raw_matches = results.get((idx1, idx2))
+            if raw_matches is not None and len(raw_matches) >= 5:
+                additional_matches[(idx1, idx2)] = [
+                    cv2.DMatch(query_idx, train_idx, distance) for query_idx, train_idx, distance in raw_matches
+                ]
+                # インデックス配列はワーカーの結果から直接作成
+                raw_arr = np.asarray(raw_matches)
+                self.match_indices[(idx1, idx2)] = (raw_arr[:, 0].astype(np.int32), raw_arr[:, 1].astype(np.int32))
+                logger.debug("追加マッチング生成: (%s, %s) -> %d マッチング", idx1, idx2, len(raw_matches))
         
         return additional_matches
 
 
 if __name__ == "__main__":
+    # モジュールロガーのINFO以上をコンソールに出力
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
     # テスト用コード
     print("SfMパイプラインのテストを開始")
     